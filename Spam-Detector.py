@@ -6,35 +6,34 @@
 # In[1]:
 
 
-import random
-import nltk
-import pandas as pd
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem.porter import PorterStemmer
-from nltk.stem import WordNetLemmatizer
+from spam_detector import (Featurizer, Preprocessor, VectorizedNaiveBayes, accuracy, build_feature_store, evaluate,
+                           format_report, instrumentation, load_corpus, load_preprocessed, save_model,
+                           train_test_split)
+
+## set PROFILE to True to time every pipeline stage, the report is printed in the last cell
+PROFILE = False
+if PROFILE:
+    instrumentation.enable()
 
 
 # In[2]:
 
 
-## Reading the given dataset
-spam = pd.read_csv("SMSSpamCollection.txt", sep = "\t", names=["label", "message"])
+## Reading the given dataset, in one pass into a message column and a small int label column
+corpus = load_corpus("SMSSpamCollection.txt")
 
 
 # In[3]:
 
 
-print(spam.head())
+print(corpus)
 
 
 # In[4]:
 
 
 ## Converting the read dataset in to a list of tuples, each tuple(row) contianing the message and it's label
-data_set = []
-for index,row in spam.iterrows():
-    data_set.append((row['message'], row['label']))
+data_set = corpus.pairs()
 
 
 # In[5]:
@@ -51,44 +50,10 @@ print(len(data_set))
 
 # ### Preprocessing
 
-# In[7]:
-
-
-## initialise the inbuilt Stemmer and the Lemmatizer
-stemmer = PorterStemmer()
-wordnet_lemmatizer = WordNetLemmatizer()
-
-
-# In[8]:
-
-
-def preprocess(document, stem=True):
-    'changes document to lower case, removes stopwords and lemmatizes/stems the remainder of the sentence'
-
-    # change sentence to lower case
-    document = document.lower()
-
-    # tokenize into words
-    words = word_tokenize(document)
-
-    # remove stop words
-    words = [word for word in words if word not in stopwords.words("english")]
-
-    if stem:
-        words = [stemmer.stem(word) for word in words]
-    else:
-        words = [wordnet_lemmatizer.lemmatize(word, pos='v') for word in words]
-
-    # join words to make sentence
-    document = " ".join(words)
-
-    return document
-
-
 # In[16]:
 
 
-get_ipython().run_cell_magic('time', '', '## - Performing the preprocessing steps on all messages\nmessages_set = []\nfor (message, label) in data_set:\n    words_filtered = [e.lower() for e in preprocess(message, stem=False).split() if len(e) >= 3]\n    messages_set.append((words_filtered, label))')
+get_ipython().run_cell_magic('time', '', '## - Performing the preprocessing steps on all messages\n## the result is cached on disk, keyed by the dataset content and the preprocessing settings,\n## so only the first run (or a changed dataset / setting) pays for tokenizing and lemmatizing\nmessages_set, vocabulary = load_preprocessed("SMSSpamCollection.txt", stem=False, min_length=3)')
 
 
 # In[17]:
@@ -99,46 +64,18 @@ print(messages_set[:5])
 
 # ### Preparing to create features
 
-# In[18]:
-
-
-## - creating a single list of all words in the entire dataset for feature list creation
-
-def get_words_in_messages(messages):
-    all_words = []
-    for (message, label) in messages:
-      all_words.extend(message)
-    return all_words
-
-
-# In[19]:
-
-
-## - creating a final feature list using an intuitive FreqDist, to eliminate all the duplicate words
-## Note : we can use the Frequency Distribution of the entire dataset to calculate Tf-Idf scores like we did earlier.
-
-def get_word_features(wordlist):
-
-    #print(wordlist[:10])
-    wordlist = nltk.FreqDist(wordlist)
-    word_features = wordlist.keys()
-    return word_features
-
-
 # In[21]:
 
 
 ## - creating the word features for the entire dataset
-word_features = get_word_features(get_words_in_messages(messages_set))
+## the cached vocabulary holds every word of the preprocessed messages, mapped once to integer ids
+## in the order nltk.FreqDist lists them
+word_features = vocabulary.words
 print(len(word_features))
 
-
-# In[27]:
-
-
-#print(word_features)
-# it gives howmany time word occures in a document
-#print(list(nltk.FreqDist(get_words_in_messages(messages_set)).values()))
+## - the one featurization path shared by training and inference: raw message -> ids of the words it contains.
+## It must use the same preprocessing settings as load_preprocessed above
+featurizer = Featurizer(vocabulary, Preprocessor(stem=False, min_length=3))
 
 
 # ### Preparing to create a train and test set
@@ -146,21 +83,17 @@ print(len(word_features))
 # In[28]:
 
 
-## - creating slicing index at 80% threshold
-sliceIndex = int((len(messages_set)*.8))
-
-
-# In[29]:
-
-
-## - shuffle the pack to create a random and unbiased split of the dataset
-random.shuffle(messages_set)
+## - 80 / 20 split of the message indices, seeded so it is reproducible and stratified so both sets keep
+## the spam / ham ratio; messages_set itself is neither shuffled nor copied
+## ( `cross_validate(TokenCorpus.from_labeled(messages_set), k=5)` runs a k-fold cross-validation instead )
+train_rows, test_rows = train_test_split([label for (message, label) in messages_set], test_size=.2, seed=0)
 
 
 # In[30]:
 
 
-train_messages, test_messages = messages_set[:sliceIndex], messages_set[sliceIndex:]
+train_messages = [messages_set[i] for i in train_rows]
+test_messages = [messages_set[i] for i in test_rows]
 
 
 # In[32]:
@@ -172,28 +105,16 @@ print(len(test_messages))
 
 # ### Preparing to create feature maps for train and test data
 
-# In[33]:
-
-
-## creating a LazyMap of feature presence for each of the 8K+ features with respect to each of the SMS messages
-def extract_features(document):
-    document_words = set(document)
-    features = {}
-    for word in word_features:
-        features['contains(%s)' % word] = (word in document_words)
-    return features
-
-
 # In[34]:
 
 
-get_ipython().run_cell_magic('time', '', '## - creating the feature map of train and test data\n\ntraining_set = nltk.classify.apply_features(extract_features, train_messages)\ntesting_set = nltk.classify.apply_features(extract_features, test_messages)')
+get_ipython().run_cell_magic('time', '', '## - creating the feature map of train and test data : the ids of the 8K+ vocabulary words each message contains\n## each split is encoded once into a compact CSR matrix that training, evaluation and inspection reuse;\n## with a memory_budget (bytes) a split that would not fit is encoded lazily, chunk by chunk\n\ntraining_set = build_feature_store([message for (message, label) in train_messages], [label for (message, label) in train_messages], featurizer.encode_tokens, memory_budget=None)\ntesting_set = build_feature_store([message for (message, label) in test_messages], [label for (message, label) in test_messages], featurizer.encode_tokens, memory_budget=None)')
 
 
 # In[35]:
 
 
-print(training_set[:5])
+print(training_set[:5].decoded(vocabulary))
 
 
 # In[36]:
@@ -209,7 +130,9 @@ print('Test set size : ', len(testing_set))
 
 
 ## Training the classifier with NaiveBayes algorithm
-spamClassifier = nltk.NaiveBayesClassifier.train(training_set)
+## VectorizedNaiveBayes gives the same labels as nltk.NaiveBayesClassifier.train(training_set)
+## but counts straight from the encoded messages and scores with a matrix product
+spamClassifier = VectorizedNaiveBayes.train_encoded(training_set, vocabulary)
 
 
 # ### Evaluation
@@ -217,15 +140,17 @@ spamClassifier = nltk.NaiveBayesClassifier.train(training_set)
 # In[38]:
 
 
-## - Analyzing the accuracy of the test set
-print(nltk.classify.accuracy(spamClassifier, training_set))
+## - Analyzing the accuracy of the training set
+print(accuracy(spamClassifier, training_set))
 
 
 # In[39]:
 
 
-## Analyzing the accuracy of the test set
-print(nltk.classify.accuracy(spamClassifier, testing_set))
+## Analyzing the test set : with ~13% spam, accuracy alone hides how much spam gets through,
+## so the report adds the confusion matrix, spam precision / recall / F1, ROC AUC and the
+## threshold that keeps the false positive rate ( ham flagged as spam ) under 1%
+print(format_report(evaluate(spamClassifier, testing_set, positive="spam", max_fpr=0.01)))
 
 
 # In[43]:
@@ -233,7 +158,8 @@ print(nltk.classify.accuracy(spamClassifier, testing_set))
 
 ## Testing a example message with our newly trained classifier
 m = 'CONGRATULATIONS!! As a valued account holder you have been selected to receive a £900 prize reward! Valid 12 hours only.'
-print('Classification result : ', spamClassifier.classify(extract_features(m.split())))
+## the raw message goes through the same featurizer as the training data
+print('Classification result : ', spamClassifier.classify(featurizer.featurize(m)))
 
 
 # In[47]:
@@ -253,3 +179,17 @@ pickle.dump(spamClassifier,f)
 print('Classifier stored at ', f.name)
 f.close()
 
+
+# In[49]:
+
+
+## storing the classifier in the compact model format, loadable with spam_detector.load_model
+save_model(spamClassifier, 'nb_spam_classifier.nbm', preprocessing=featurizer.preprocessor)
+print('Classifier stored at ', 'nb_spam_classifier.nbm')
+
+
+# In[50]:
+
+
+if PROFILE:
+    print(instrumentation.to_json())
@@ -0,0 +1 @@
+## Benchmarks, reports and tools, run from the repository root with python -m scripts.<name>
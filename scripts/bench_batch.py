@@ -0,0 +1,35 @@
+## Compares one-message-at-a-time classification with BatchClassifier batch sizes
+##
+## usage : python -m scripts.bench_batch [SMSSpamCollection.txt]
+
+import sys
+
+from spam_detector import (BatchClassifier, Featurizer, Preprocessor, VectorizedNaiveBayes, Vocabulary,
+                           read_sms_collection)
+from spam_detector.benchmark import timed
+
+BATCH_SIZES = (1, 10, 100, 1000, 10000)
+
+
+def main(path="SMSSpamCollection.txt"):
+    data_set = read_sms_collection(path)
+    preprocessor = Preprocessor(stem=False)
+    messages_set = [(preprocessor(message), label) for (message, label) in data_set]
+    vocabulary = Vocabulary.from_documents(message for (message, label) in messages_set)
+    featurizer = Featurizer(vocabulary, preprocessor)
+    classifier = VectorizedNaiveBayes.train_encoded(
+        [(featurizer.encode_tokens(message), label) for (message, label) in messages_set], vocabulary)
+    messages = [message for (message, label) in data_set]
+
+    single_time, single = timed(lambda: [classifier.classify(featurizer.featureset(message)) for message in messages])
+    print('%-22s : %10.1f messages/s' % ('one at a time', len(messages) / single_time))
+
+    for batch_size in BATCH_SIZES:
+        scorer = BatchClassifier(classifier, batch_size=batch_size)
+        batch_time, (labels, probabilities) = timed(lambda: scorer.score_many(messages))
+        print('%-22s : %10.1f messages/s (%.1fx), same labels : %s' % (
+            'batch_size=%d' % batch_size, len(messages) / batch_time, single_time / batch_time, labels == single))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,57 @@
+## Compares the dict based `extract_features` with the sparse `FeatureEncoder`
+##
+## usage : python -m scripts.bench_features [SMSSpamCollection.txt]
+
+import sys
+
+import nltk
+
+from spam_detector import FeatureEncoder, Preprocessor, Vocabulary, read_sms_collection
+from spam_detector.benchmark import per_item
+
+
+def legacy_extractor(word_features):
+    'the original `extract_features` of Spam-Detector.py'
+    def extract_features(document):
+        document_words = set(document)
+        features = {}
+        for word in word_features:
+            features['contains(%s)' % word] = (word in document_words)
+        return features
+    return extract_features
+
+
+def mean_size(function, documents):
+    'returns the mean `sys.getsizeof` of the results, without keeping them alive'
+    return sum(sys.getsizeof(function(document)) for document in documents) / len(documents)
+
+
+def main(path="SMSSpamCollection.txt"):
+    preprocessor = Preprocessor(stem=False)
+    documents = [preprocessor(message) for (message, label) in read_sms_collection(path)]
+
+    word_features = nltk.FreqDist(word for document in documents for word in document).keys()
+    vocabulary = Vocabulary.from_documents(documents)
+    assert list(word_features) == vocabulary.words
+    encoder = FeatureEncoder(vocabulary)
+
+    legacy_extract_features = legacy_extractor(word_features)
+    legacy_time = per_item(legacy_extract_features, documents, repeats=1)
+    legacy_bytes = mean_size(legacy_extract_features, documents)
+    encode_time = per_item(encoder.encode, documents, repeats=1)
+    encoded_bytes = mean_size(encoder.encode, documents)
+    encoded = encoder.encode_many(documents)
+    expand_time = per_item(encoder.featureset, encoded, repeats=1)
+    identical = all(legacy_extract_features(document) == encoder.featureset(ids)
+                    for document, ids in zip(documents, encoded))
+
+    print('Messages / vocabulary      : ', len(documents), '/', len(vocabulary))
+    print('extract_features           : %8.1f us/message, %9.0f bytes/message' % (1e6 * legacy_time, legacy_bytes))
+    print('FeatureEncoder.encode      : %8.1f us/message, %9.0f bytes/message' % (1e6 * encode_time, encoded_bytes))
+    print('FeatureEncoder.featureset  : %8.1f us/message (nltk compatible dict)' % (1e6 * expand_time))
+    print('Encode speed-up            : %8.1fx' % (legacy_time / encode_time))
+    print('Identical feature dicts    : ', identical)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,79 @@
+## Compares the corpus loaders with the pandas `read_csv` + `iterrows` path of Spam-Detector.py
+##
+## usage : python -m scripts.bench_loader [SMSSpamCollection.txt] [spam_dataset.csv] [repeats]
+##
+## Every loader runs `repeats` times; the best time is reported, with the memory
+## the loaded data set holds ( tracemalloc peak of one load ).
+
+import sys
+import tracemalloc
+
+import pandas as pd
+
+from spam_detector import iter_corpus, load_corpus
+from spam_detector.benchmark import timed
+
+
+def pandas_iterrows(path):
+    'the original loop of Spam-Detector.py'
+    if path.endswith(".csv"):
+        spam = pd.read_csv(path)
+    else:
+        spam = pd.read_csv(path, sep="\t", names=["label", "message"])
+    data_set = []
+    for index, row in spam.iterrows():
+        data_set.append((row['message'], row['label']))
+    return data_set
+
+
+def pandas_columns(path):
+    'pandas without iterrows, zipping the two columns'
+    if path.endswith(".csv"):
+        spam = pd.read_csv(path)
+    else:
+        spam = pd.read_csv(path, sep="\t", names=["label", "message"])
+    return list(zip(spam['message'], spam['label']))
+
+
+LOADERS = [
+    ('pandas read_csv + iterrows', pandas_iterrows),
+    ('pandas read_csv + zip', pandas_columns),
+    ('load_corpus', lambda path: load_corpus(path)),
+    ('load_corpus mmap', lambda path: load_corpus(path, mmap=True)),
+    ('iter_corpus ( lazy )', lambda path: sum(1 for pair in iter_corpus(path))),
+    ('iter_corpus mmap ( lazy )', lambda path: sum(1 for pair in iter_corpus(path, mmap=True))),
+]
+
+
+def peak_memory(loader, path):
+    'returns (tracemalloc peak, result) of one load'
+    tracemalloc.start()
+    result = loader(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, result
+
+
+def main(tsv_path="SMSSpamCollection.txt", csv_path="spam_dataset.csv", repeats=5):
+    repeats = int(repeats)
+    for path in (tsv_path, csv_path):
+        print('%s' % path)
+        print('  %-28s %10s %10s %12s %10s' % ('loader', 'messages', 'best ms', 'peak MB', 'speedup'))
+        baseline = None
+        for name, loader in LOADERS:
+            seconds, result = timed(lambda: loader(path), repeats)
+            del result
+            peak, result = peak_memory(loader, path)
+            baseline = baseline or seconds
+            count = result if isinstance(result, int) else len(result)
+            print('  %-28s %10d %10.1f %12.2f %9.1fx' % (name, count, 1e3 * seconds, peak / 2.0 ** 20,
+                                                         baseline / seconds))
+        ## - pandas treats `"` as a quote character in the tab separated file, so it merges a few messages
+        corpus = load_corpus(path)
+        print('  same rows as pandas : %s   labels : %s, %s' % (corpus.pairs() == pandas_columns(path),
+                                                              corpus.labels.dtype, corpus.label_counts()))
+        print('')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
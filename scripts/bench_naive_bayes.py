@@ -0,0 +1,59 @@
+## Compares nltk.NaiveBayesClassifier with VectorizedNaiveBayes on the 80/20 split
+##
+## usage : python -m scripts.bench_naive_bayes [SMSSpamCollection.txt]
+
+import os
+import pickle
+import random
+import sys
+
+import nltk
+
+from spam_detector import FeatureEncoder, Preprocessor, VectorizedNaiveBayes, Vocabulary, read_sms_collection
+from spam_detector.benchmark import timed
+
+PICKLED_MODEL = os.path.join("Trained-model-Direct-Use", "nb_spam_classifier.pickle")
+
+
+def main(path="SMSSpamCollection.txt"):
+    preprocessor = Preprocessor(stem=False)
+    messages_set = [(preprocessor(message), label) for (message, label) in read_sms_collection(path)]
+    vocabulary = Vocabulary.from_documents(message for (message, label) in messages_set)
+    encoder = FeatureEncoder(vocabulary)
+
+    random.Random(0).shuffle(messages_set)
+    slice_index = int(len(messages_set) * .8)
+    train_messages, test_messages = messages_set[:slice_index], messages_set[slice_index:]
+    training_set = nltk.classify.apply_features(encoder.extract_features, train_messages)
+    test_features = [encoder.extract_features(message) for (message, label) in test_messages]
+    train_encoded = [(encoder.encode(message), label) for (message, label) in train_messages]
+    test_encoded = [encoder.encode(message) for (message, label) in test_messages]
+
+    nltk_train, nltk_classifier = timed(lambda: nltk.NaiveBayesClassifier.train(training_set))
+    vectorized_train, vectorized = timed(lambda: VectorizedNaiveBayes.train_encoded(train_encoded, vocabulary))
+    nltk_classify, nltk_labels = timed(lambda: nltk_classifier.classify_many(test_features))
+    vectorized_classify, vectorized_labels = timed(lambda: vectorized.classify_many(test_encoded))
+    converted = VectorizedNaiveBayes.from_nltk(nltk_classifier)
+
+    print('Train / test messages      : ', len(train_messages), '/', len(test_messages))
+    print('Vocabulary                 : ', len(vocabulary))
+    print('nltk train                 : %10.3f s' % nltk_train)
+    print('VectorizedNaiveBayes train : %10.3f s' % vectorized_train)
+    print('nltk classify_many         : %10.3f s' % nltk_classify)
+    print('VectorizedNaiveBayes       : %10.3f s (%.0fx)' % (vectorized_classify, nltk_classify / vectorized_classify))
+    print('Same labels (trained)      : ', nltk_labels == vectorized_labels)
+    print('Same labels (from_nltk)    : ', nltk_labels == converted.classify_many(test_encoded))
+
+    if os.path.exists(PICKLED_MODEL):
+        with open(PICKLED_MODEL, 'rb') as f:
+            pickled = pickle.load(f)
+        convert_time, converted = timed(lambda: VectorizedNaiveBayes.from_nltk(pickled))
+        ## - featuresets must cover the vocabulary the pickled model was trained on
+        pickled_encoder = FeatureEncoder(converted.vocabulary)
+        features = [pickled_encoder.extract_features(message) for (message, label) in test_messages[:200]]
+        print('Pickled model converted    : %10.3f s, %d features' % (convert_time, len(converted)))
+        print('Same labels (pickle)       : ', pickled.classify_many(features) == converted.classify_many(features))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,29 @@
+## Reports how preprocessing the corpus scales from 1 to N worker processes
+##
+## usage : python -m scripts.bench_parallel [SMSSpamCollection.txt] [max workers]
+
+import os
+import sys
+
+from spam_detector import preprocess_parallel, read_sms_collection
+from spam_detector.benchmark import timed
+
+
+def main(path="SMSSpamCollection.txt", max_workers=None):
+    messages = [message for (message, label) in read_sms_collection(path)]
+    max_workers = int(max_workers or os.cpu_count() or 1)
+
+    baseline = None
+    serial_time = None
+    print('%8s %10s %12s %9s %11s %10s' % ('workers', 'seconds', 'messages/s', 'speed-up', 'efficiency', 'identical'))
+    for workers in range(1, max_workers + 1):
+        elapsed, tokens = timed(lambda: preprocess_parallel(messages, workers=workers))
+        if baseline is None:
+            baseline, serial_time = tokens, elapsed
+        print('%8d %10.2f %12.1f %8.2fx %10.0f%% %10s' % (
+            workers, elapsed, len(messages) / elapsed, serial_time / elapsed,
+            100 * serial_time / elapsed / workers, tokens == baseline))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,57 @@
+## Compares incremental partial_fit updates with full retraining
+##
+## usage : python -m scripts.bench_partial_fit [SMSSpamCollection.txt] [batch size]
+##
+## Trains on the first half of the corpus, then adds the rest in batches, as hourly
+## updates would, and checks the result equals a model trained on everything at once.
+## partial_fit only counts the batch; the probabilities are refreshed once, when the
+## updated model is first scored, which `first classify` measures.
+
+import sys
+import tempfile
+
+import numpy as np
+
+from spam_detector import FeatureMatrix, Featurizer, VectorizedNaiveBayes, Vocabulary, load_preprocessed
+from spam_detector.benchmark import timed
+
+
+def train_full(messages_set):
+    vocabulary = Vocabulary.from_documents(tokens for (tokens, label) in messages_set)
+    featurizer = Featurizer(vocabulary)
+    matrix = FeatureMatrix.from_encoded([featurizer.encode_tokens(tokens) for (tokens, label) in messages_set],
+                                        [label for (tokens, label) in messages_set])
+    return VectorizedNaiveBayes.train_matrix(matrix, vocabulary)
+
+
+def main(path="SMSSpamCollection.txt", batch_size=100):
+    batch_size = int(batch_size)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        messages_set, _ = load_preprocessed(path, cache_dir=cache_dir)
+    half = len(messages_set) // 2
+
+    classifier = train_full(messages_set[:half])
+    update_times = []
+    full_times = []
+    for start in range(half, len(messages_set), batch_size):
+        batch = messages_set[start:start + batch_size]
+        update_times.append(timed(lambda: classifier.partial_fit(batch))[0])
+        full_time, full = timed(lambda: train_full(messages_set[:start + len(batch)]))
+        full_times.append(full_time)
+
+    refresh_time, _ = timed(lambda: classifier.classify([]))
+
+    print('batches of %d messages : %d updates' % (batch_size, len(update_times)))
+    print('partial_fit           : %8.2f ms mean, %8.2f ms max' % (1e3 * np.mean(update_times), 1e3 * np.max(update_times)))
+    print('first classify        : %8.2f ms (probabilities refreshed once for all updates)' % (1e3 * refresh_time))
+    print('full retrain          : %8.2f ms mean, %8.2f ms max (preprocessed tokens, vocabulary + encode + train)'
+          % (1e3 * np.mean(full_times), 1e3 * np.max(full_times)))
+    print('vocabulary            : %d words (%d after the first half)' % (len(classifier.vocabulary), len(
+        Vocabulary.from_documents(tokens for (tokens, label) in messages_set[:half]))))
+    print('same as full training : ', classifier.vocabulary.words == full.vocabulary.words and
+          classifier.labels() == full.labels() and np.allclose(classifier.delta, full.delta, rtol=0, atol=1e-12) and
+          np.allclose(classifier.bias, full.bias, rtol=0, atol=1e-9))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
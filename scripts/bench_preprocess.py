@@ -0,0 +1,54 @@
+## Compares the throughput of the original `preprocess` loop with `Preprocessor`
+##
+## usage : python -m scripts.bench_preprocess [SMSSpamCollection.txt]
+
+import sys
+
+from nltk.tokenize import word_tokenize
+from nltk.corpus import stopwords
+from nltk.stem import WordNetLemmatizer
+
+from spam_detector import NormalizationCache, Preprocessor, read_sms_collection
+from spam_detector.benchmark import timed
+
+wordnet_lemmatizer = WordNetLemmatizer()
+
+
+def legacy_preprocess(document):
+    'the original per-token stopword lookup from Spam-Detector.py (stem=False)'
+    document = document.lower()
+    words = word_tokenize(document)
+    words = [word for word in words if word not in stopwords.words("english")]
+    words = [wordnet_lemmatizer.lemmatize(word, pos='v') for word in words]
+    return " ".join(words)
+
+
+def legacy_tokens(message):
+    return [e.lower() for e in legacy_preprocess(message).split() if len(e) >= 3]
+
+
+def main(path="SMSSpamCollection.txt"):
+    messages = [message for (message, label) in read_sms_collection(path)]
+    preprocessor = Preprocessor(stem=False)
+
+    ## - warm up WordNet and the tokenizer so neither run pays the lazy loading cost
+    legacy_tokens(messages[0])
+    preprocessor(messages[0])
+
+    legacy_time, legacy = timed(lambda: [legacy_tokens(message) for message in messages])
+    compiled_time, compiled = timed(lambda: preprocessor.tokens_many(messages))
+    cache = NormalizationCache()
+    cached_preprocessor = Preprocessor(stem=False, cache=cache)
+    cached_time, cached = timed(lambda: cached_preprocessor.tokens_many(messages))
+
+    print('Messages            : ', len(messages))
+    print('preprocess()        : %10.1f messages/s (%.2f s)' % (len(messages) / legacy_time, legacy_time))
+    print('Preprocessor        : %10.1f messages/s (%.2f s)' % (len(messages) / compiled_time, compiled_time))
+    print('Preprocessor+cache  : %10.1f messages/s (%.2f s)' % (len(messages) / cached_time, cached_time))
+    print('Speed-up            : %10.1fx / %.1fx' % (legacy_time / compiled_time, legacy_time / cached_time))
+    print('Cache               : ', cache.stats())
+    print('Identical output    : ', legacy == compiled == cached)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,92 @@
+## Single-message latency of the Bernoulli model against the vocabulary size
+##
+## usage : python -m scripts.bench_single_message [SMSSpamCollection.txt] [MODEL.pickle]
+##
+## The model is trained on the dataset, then padded with words no message contains,
+## up to 64 times the real vocabulary. The padding changes every absent-word sum,
+## which `bias` holds precomputed, but not the words a message contains.
+##   dense         : every feature scored, present or absent, as nltk does
+##   classify_many : the batch path on a batch of one
+##   classify      : the single-message fast path, one gather of the present rows
+## Exactness is checked against the pickled nltk classifier, message by message.
+
+import os
+import pickle
+import sys
+
+import numpy as np
+
+from spam_detector import (FeatureEncoder, FeatureMatrix, Preprocessor, VectorizedNaiveBayes, Vocabulary,
+                           read_sms_collection)
+from spam_detector.benchmark import per_item
+from spam_detector.naive_bayes import count_matrix
+
+PICKLED_MODEL = os.path.join("Trained-model-Direct-Use", "nb_spam_classifier.pickle")
+PADDING = (1, 4, 16, 64)
+SAMPLE = 500
+NLTK_SAMPLE = 100
+
+
+def dense_classify(classifier):
+    'scores every vocabulary feature of the message, the cost nltk pays'
+    def classify(ids):
+        present = np.zeros(len(classifier), dtype=bool)
+        present[ids] = True
+        scores = classifier.log_prior + np.where(present, classifier.log_present, classifier.log_absent).sum(axis=1)
+        return classifier.labels()[int(scores.argmax())]
+    return classify
+
+
+def check_exactness(model_path, documents):
+    with open(model_path, 'rb') as f:
+        pickled = pickle.load(f)
+    converted = VectorizedNaiveBayes.from_nltk(pickled)
+    encoder = FeatureEncoder(converted.vocabulary)
+    sample = documents[:NLTK_SAMPLE]
+    featuresets = [encoder.extract_features(tokens) for tokens in sample]
+    same_labels = 0
+    max_difference = 0.0
+    for tokens, featureset in zip(sample, featuresets):
+        expected = pickled.prob_classify(featureset)
+        actual = converted.prob_classify(encoder.encode(tokens))
+        same_labels += expected.max() == actual.max()
+        max_difference = max(max_difference, max(abs(expected.prob(label) - actual.prob(label))
+                                                 for label in converted.labels()))
+    print('\npickled nltk model, %d messages : same labels %d / %d, max probability difference %.2e' % (
+        len(sample), same_labels, len(sample), max_difference))
+    nltk_latency = per_item(pickled.prob_classify, featuresets[:20])
+    fast_latency = per_item(converted.prob_classify, [encoder.encode(tokens) for tokens in sample])
+    print('prob_classify : nltk %.1f us/msg, fast path %.1f us/msg (%.0fx)' % (
+        1e6 * nltk_latency, 1e6 * fast_latency, nltk_latency / fast_latency))
+
+
+def main(path="SMSSpamCollection.txt", model_path=PICKLED_MODEL):
+    data_set = read_sms_collection(path)
+    documents = Preprocessor().tokens_many(message for (message, label) in data_set)
+    vocabulary = Vocabulary.from_documents(documents)
+    encoder = FeatureEncoder(vocabulary)
+    encoded = [encoder.encode(tokens) for tokens in documents]
+    labels, feature_counts, label_counts = count_matrix(
+        FeatureMatrix.from_encoded(encoded, [label for (message, label) in data_set]), len(vocabulary))
+    sample = encoded[:SAMPLE]
+
+    print('%d messages, %d words, mean %.1f words per message' % (
+        len(encoded), len(vocabulary), np.mean([len(ids) for ids in encoded])))
+    print('%10s %12s %15s %12s %14s' % ('features', 'dense us', 'classify_many', 'classify', 'same labels'))
+    for padding in PADDING:
+        padded = Vocabulary(vocabulary.words + ['~pad%d' % i for i in range(len(vocabulary) * (padding - 1))])
+        counts = np.hstack([feature_counts, np.zeros((len(labels), len(padded) - len(vocabulary)), dtype=np.int64)])
+        classifier = VectorizedNaiveBayes.from_counts(labels, padded, counts, label_counts)
+        dense = dense_classify(classifier)
+        same = sum(dense(ids) == classifier.classify(ids) for ids in sample)
+        print('%10d %12.1f %15.1f %12.1f %10d / %d' % (
+            len(padded), 1e6 * per_item(dense, sample),
+            1e6 * per_item(lambda ids: classifier.classify_many([ids]), sample),
+            1e6 * per_item(classifier.classify, sample), same, len(sample)))
+
+    if os.path.exists(model_path):
+        check_exactness(model_path, documents)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
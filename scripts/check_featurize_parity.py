@@ -0,0 +1,44 @@
+## Regression check : training and inference features must be identical for the whole corpus
+##
+## usage : python -m scripts.check_featurize_parity [SMSSpamCollection.txt]
+##
+## Compares, for every message, the features the training script builds (cached preprocessed
+## tokens -> ids), the features `Featurizer.featurize` builds from the raw message at inference
+## time, and the ids of the tokens a fresh `Preprocessor` gives for the message.
+## Exits with status 1 and lists the first mismatches if any message differs.
+## tests/test_featurize_parity.py checks the same on a fixed set of messages without NLTK data.
+
+import sys
+import tempfile
+
+from spam_detector import Featurizer, Preprocessor, load_preprocessed, read_sms_collection
+
+
+def main(path="SMSSpamCollection.txt"):
+    data_set = read_sms_collection(path)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        messages_set, vocabulary = load_preprocessed(path, cache_dir=cache_dir, stem=False, min_length=3)
+    preprocessor = Preprocessor(stem=False, min_length=3)
+    featurizer = Featurizer(vocabulary, preprocessor)
+
+    mismatches = []
+    for (message, label), (tokens, cached_label) in zip(data_set, messages_set):
+        training = featurizer.encode_tokens(tokens)
+        inference = featurizer.featurize(message)
+        preprocessed = featurizer.encode_tokens(preprocessor.tokens(message))
+        if not (training == inference == preprocessed) or label != cached_label:
+            mismatches.append((message, training, inference, preprocessed))
+
+    print('messages checked : ', len(data_set))
+    print('mismatches       : ', len(mismatches))
+    words = vocabulary.words
+    for message, training, inference, preprocessed in mismatches[:10]:
+        print(repr(message))
+        print('   training  : ', [words[i] for i in training])
+        print('   inference : ', [words[i] for i in inference])
+        print('   tokens    : ', [words[i] for i in preprocessed])
+    return 1 if mismatches or len(messages_set) != len(data_set) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*sys.argv[1:]))
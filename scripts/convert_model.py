@@ -0,0 +1,29 @@
+## Converts a pickled classifier into the memory-mappable model format and compares load times
+##
+## usage : python -m scripts.convert_model [MODEL.pickle] [MODEL.nbm]
+
+import os
+import pickle
+import sys
+
+from spam_detector.benchmark import timed
+from spam_detector.model_io import convert_pickle, load_model
+
+PICKLED_MODEL = os.path.join("Trained-model-Direct-Use", "nb_spam_classifier.pickle")
+
+
+def main(pickle_path=PICKLED_MODEL, path=None):
+    path = path or os.path.splitext(pickle_path)[0] + ".nbm"
+    classifier = convert_pickle(pickle_path, path)
+    print('wrote %s : %d labels, %d features' % (path, len(classifier.labels()), len(classifier.vocabulary)))
+
+    def load_pickle():
+        with open(pickle_path, 'rb') as f:
+            pickle.load(f)
+
+    print('pickle      : %9d bytes, %8.2f ms to load' % (os.path.getsize(pickle_path), 1e3 * timed(load_pickle, 5)[0]))
+    print('model file  : %9d bytes, %8.2f ms to load' % (os.path.getsize(path), 1e3 * timed(lambda: load_model(path), 5)[0]))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
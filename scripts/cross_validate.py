@@ -0,0 +1,37 @@
+## Seeded, stratified k-fold cross-validation of the Naive Bayes variants
+##
+## usage : python -m scripts.cross_validate [SMSSpamCollection.txt] [k] [seed] [workers]
+##
+## The preprocessed corpus is interned once into a TokenCorpus; folds are index arrays
+## over it and run in `workers` processes sharing its arrays ( default one per CPU ).
+
+import sys
+import tempfile
+
+from spam_detector import (ComplementNaiveBayes, MultinomialNaiveBayes, TokenCorpus, VectorizedNaiveBayes,
+                           cross_validate, load_preprocessed)
+
+MODELS = [VectorizedNaiveBayes, MultinomialNaiveBayes, ComplementNaiveBayes]
+
+
+def main(path="SMSSpamCollection.txt", k=5, seed=0, workers=None):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        messages_set, _ = load_preprocessed(path, cache_dir=cache_dir)
+    corpus = TokenCorpus.from_labeled(messages_set)
+    print(corpus, corpus.label_counts())
+
+    for classifier in MODELS:
+        report = cross_validate(corpus, k=int(k), seed=int(seed), workers=int(workers) if workers else None,
+                                classifier=classifier)
+        print('\n%s, %d folds, seed %d, %d worker(s)' % (classifier.__name__, report["k"], report["seed"],
+                                                         report["workers"]))
+        for fold in report["folds"]:
+            print('  fold %d : %6.2f%% on %d messages, %8.1f ms' % (fold["fold"], 100 * fold["accuracy"],
+                                                                  fold["test"], 1e3 * fold["seconds"]))
+        print('  accuracy %.2f%% +- %.2f%%, wall clock %.1f ms' % (100 * report["mean_accuracy"],
+                                                                   100 * report["std_accuracy"],
+                                                                   1e3 * report["seconds"]))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
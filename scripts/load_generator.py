@@ -0,0 +1,99 @@
+## Load generator for the HTTP scoring service
+##
+## usage : python -m scripts.load_generator [--url http://127.0.0.1:8080] [--concurrency 32] [--requests 5000]
+##                                         [--batch 0] [--dataset SMSSpamCollection.txt]
+##
+## Every client keeps one connection open and sends messages from the dataset, either one per
+## /classify request or --batch messages per /classify_batch request.
+
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from spam_detector import read_sms_collection
+
+
+async def request(reader, writer, host, path, payload):
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(("POST %s HTTP/1.1\r\nHost: %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n"
+                  % (path, host, len(body))).encode("latin-1") + body)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, messages, offset, count, batch, latencies, failures):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for i in range(count):
+            start = offset + i * max(batch, 1)
+            if batch:
+                path = "/classify_batch"
+                payload = {"messages": [messages[(start + j) % len(messages)] for j in range(batch)]}
+            else:
+                path = "/classify"
+                payload = {"message": messages[start % len(messages)]}
+            started = time.perf_counter()
+            status = await request(reader, writer, host, path, payload)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                failures.append(status)
+    finally:
+        writer.close()
+
+
+async def fetch_metrics(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(("GET /metrics HTTP/1.1\r\nHost: %s\r\nConnection: close\r\n\r\n" % host).encode("latin-1"))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+async def run(url, concurrency, requests, batch, dataset):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    messages = [message for (message, label) in read_sms_collection(dataset)]
+    latencies, failures = [], []
+    ## - the first `extra` clients send one request more, so the total is exactly `requests`
+    per_client, extra = divmod(requests, concurrency)
+    counts = [per_client + (i < extra) for i in range(concurrency)]
+    offsets = [sum(counts[:i]) * max(batch, 1) for i in range(concurrency)]
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client(host, port, messages, offset, count, batch, latencies, failures)
+                           for offset, count in zip(offsets, counts) if count])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    sent = len(latencies)
+    print('requests          : %d in %.2f s (%d failed)' % (sent, elapsed, len(failures)))
+    print('requests/s        : %.1f' % (sent / elapsed))
+    print('messages/s        : %.1f' % (sent * max(batch, 1) / elapsed))
+    for p in (50, 90, 99):
+        print('latency p%-2d       : %.2f ms' % (p, 1e3 * latencies[min(sent - 1, int(p / 100.0 * sent))]))
+    print('server metrics    : %s' % json.dumps(await fetch_metrics(host, port)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the spam scoring service")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent connections")
+    parser.add_argument("--requests", type=int, default=5000, help="total requests")
+    parser.add_argument("--batch", type=int, default=0, help="messages per /classify_batch request, 0 uses /classify")
+    parser.add_argument("--dataset", default="SMSSpamCollection.txt")
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.url, args.concurrency, args.requests, args.batch, args.dataset))
+
+
+if __name__ == '__main__':
+    main()
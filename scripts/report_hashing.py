@@ -0,0 +1,80 @@
+## Dictionary features vs hashed features at several bucket counts
+##
+## usage : python -m scripts.report_hashing [SMSSpamCollection.txt] [seed]
+##
+## Reports test accuracy, model file size, training time and per-message scoring
+## latency on a seeded 80/20 split, and checks that merging classifiers trained on
+## two halves of the training split equals one trained on all of it.
+
+import os
+import random
+import sys
+import tempfile
+
+import numpy as np
+
+from spam_detector import (FeatureMatrix, Featurizer, HashingFeaturizer, Preprocessor, VectorizedNaiveBayes,
+                           Vocabulary, accuracy, load_preprocessed, merge_hashed, read_sms_collection)
+from spam_detector.benchmark import per_item, timed
+from spam_detector.model_io import save_model
+
+SETTINGS = [(1 << 10, 1), (1 << 12, 1), (1 << 14, 1), (1 << 16, 1), (1 << 18, 1), (1 << 18, 2)]
+
+
+def evaluate(name, featurizer, train_rows, test_rows, messages_set, sample):
+    'trains on the encoded training rows and prints one line of the report'
+    def train_encoded():
+        train = FeatureMatrix.from_encoded([featurizer.encode_tokens(messages_set[i][0]) for i in train_rows],
+                                           [messages_set[i][1] for i in train_rows])
+        return train, VectorizedNaiveBayes.train_matrix(train, featurizer.vocabulary)
+
+    train_time, (train, classifier) = timed(train_encoded)
+
+    test = FeatureMatrix.from_encoded([featurizer.encode_tokens(messages_set[i][0]) for i in test_rows],
+                                      [messages_set[i][1] for i in test_rows])
+    test_accuracy = accuracy(classifier, test)
+
+    single_time = per_item(lambda message: classifier.classify(featurizer.featurize(message)), sample, repeats=1)
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        model_path = os.path.join(model_dir, "model.nbm")
+        save_model(classifier, model_path)
+        model_size = os.path.getsize(model_path)
+
+    print('%-24s %8d %8.2f%% %10.1f %10.3f %14.1f' % (name, len(featurizer.vocabulary), 100 * test_accuracy,
+                                                     model_size / 1024.0, train_time, 1e6 * single_time))
+    return train, classifier
+
+
+def main(path="SMSSpamCollection.txt", seed=0):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        messages_set, _ = load_preprocessed(path, cache_dir=cache_dir)
+    data_set = read_sms_collection(path)
+
+    order = list(range(len(messages_set)))
+    random.Random(int(seed)).shuffle(order)
+    slice_index = int(len(order) * .8)
+    train_rows, test_rows = order[:slice_index], order[slice_index:]
+    sample = [data_set[i][0] for i in test_rows[:300]]
+    preprocessor = Preprocessor()
+
+    print('%-24s %8s %9s %10s %10s %14s' % ('features', 'size', 'accuracy', 'model KB', 'train s', 'us/msg single'))
+    ## - the dictionary is built from the training split only, like the hashed models see only that split
+    vocabulary = Vocabulary.from_documents(messages_set[i][0] for i in train_rows)
+    evaluate('dictionary', Featurizer(vocabulary, preprocessor), train_rows, test_rows, messages_set, sample)
+
+    for n_buckets, max_ngram in SETTINGS:
+        name = 'hashed 2^%d%s' % (n_buckets.bit_length() - 1, ' + bigrams' if max_ngram == 2 else '')
+        featurizer = HashingFeaturizer(n_buckets, max_ngram, preprocessor)
+        train, classifier = evaluate(name, featurizer, train_rows, test_rows, messages_set, sample)
+
+    half = len(train) // 2
+    merged = merge_hashed([VectorizedNaiveBayes.train_matrix(train[:half], featurizer.vocabulary),
+                           VectorizedNaiveBayes.train_matrix(train[half:], featurizer.vocabulary)])
+    same = (merged.labels() == classifier.labels() and np.array_equal(merged.feature_counts, classifier.feature_counts)
+            and np.allclose(merged.log_present, classifier.log_present))
+    print('\nmerged halves equal full training : %s' % same)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
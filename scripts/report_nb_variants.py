@@ -0,0 +1,85 @@
+## Head-to-head of the Naive Bayes variants on a seeded 80/20 split
+##
+## usage : python -m scripts.report_nb_variants [SMSSpamCollection.txt] [seed]
+##
+## nltk.NaiveBayesClassifier and VectorizedNaiveBayes use boolean `contains(word)`
+## features, the multinomial and complement models term counts. Latency is the
+## time to classify one already encoded message, averaged over the test split
+## (a sample of it for nltk, which scores every vocabulary feature).
+
+import random
+import sys
+import tempfile
+
+import nltk
+
+from spam_detector import (ComplementNaiveBayes, FeatureEncoder, FeatureMatrix, MultinomialNaiveBayes,
+                           VectorizedNaiveBayes, Vocabulary, load_preprocessed)
+from spam_detector.benchmark import per_item, timed
+
+NLTK_SAMPLE = 200
+
+
+def spam_precision_recall(predicted, expected, positive="spam"):
+    true_positive = sum(p == positive and e == positive for p, e in zip(predicted, expected))
+    predicted_positive = sum(p == positive for p in predicted)
+    actual_positive = sum(e == positive for e in expected)
+    return (true_positive / float(predicted_positive) if predicted_positive else 0.0,
+            true_positive / float(actual_positive) if actual_positive else 0.0)
+
+
+def report(name, classifier, train_time, test_inputs, expected, single_inputs):
+    predicted = classifier.classify_many(test_inputs)
+    latency = per_item(classifier.classify, single_inputs, repeats=1)
+    correct = sum(p == e for p, e in zip(predicted, expected)) / float(len(expected))
+    precision, recall = spam_precision_recall(predicted, expected)
+    print('%-30s %9.2f%% %10.2f%% %9.2f%% %10.3f %12.1f' % (name, 100 * correct, 100 * precision, 100 * recall,
+                                                            train_time, 1e6 * latency))
+
+
+def main(path="SMSSpamCollection.txt", seed=0):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        messages_set, _ = load_preprocessed(path, cache_dir=cache_dir)
+    messages_set = list(messages_set)
+    random.Random(int(seed)).shuffle(messages_set)
+    slice_index = int(len(messages_set) * .8)
+    train_messages, test_messages = messages_set[:slice_index], messages_set[slice_index:]
+    expected = [label for (tokens, label) in test_messages]
+
+    vocabulary = Vocabulary.from_documents(tokens for (tokens, label) in train_messages)
+    encoder = FeatureEncoder(vocabulary)
+    presence_train = FeatureMatrix.from_encoded([encoder.encode(tokens) for (tokens, label) in train_messages],
+                                                [label for (tokens, label) in train_messages])
+    presence_test = [encoder.encode(tokens) for (tokens, label) in test_messages]
+    terms_train = FeatureMatrix.from_encoded([encoder.encode_terms(tokens) for (tokens, label) in train_messages],
+                                             [label for (tokens, label) in train_messages])
+    terms_test = [encoder.encode_terms(tokens) for (tokens, label) in test_messages]
+
+    print('train / test messages : %d / %d, vocabulary : %d words, spam in test : %d' % (
+        len(train_messages), len(test_messages), len(vocabulary), expected.count('spam')))
+    print('%-30s %10s %11s %10s %10s %12s' % ('model', 'accuracy', 'spam prec.', 'spam rec.', 'train s', 'us/msg'))
+
+    nltk_train, nltk_classifier = timed(lambda: nltk.NaiveBayesClassifier.train(
+        nltk.classify.apply_features(encoder.extract_features, train_messages)))
+    nltk_test = nltk.classify.apply_features(encoder.extract_features, [tokens for (tokens, label) in test_messages],
+                                             labeled=False)
+    report('nltk NaiveBayesClassifier', nltk_classifier, nltk_train, nltk_test, expected,
+           [encoder.featureset(ids) for ids in presence_test[:NLTK_SAMPLE]])
+
+    models = [
+        ('VectorizedNaiveBayes', lambda: VectorizedNaiveBayes.train_matrix(presence_train, vocabulary),
+         presence_test),
+        ('MultinomialNaiveBayes', lambda: MultinomialNaiveBayes.train_matrix(terms_train, vocabulary), terms_test),
+        ('MultinomialNaiveBayes a=0.1', lambda: MultinomialNaiveBayes.train_matrix(terms_train, vocabulary, alpha=0.1),
+         terms_test),
+        ('ComplementNaiveBayes', lambda: ComplementNaiveBayes.train_matrix(terms_train, vocabulary), terms_test),
+        ('ComplementNaiveBayes norm', lambda: ComplementNaiveBayes.train_matrix(terms_train, vocabulary, norm=True),
+         terms_test),
+    ]
+    for name, train, test_inputs in models:
+        train_time, classifier = timed(train)
+        report(name, classifier, train_time, test_inputs, expected, test_inputs)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
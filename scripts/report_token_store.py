@@ -0,0 +1,87 @@
+## Memory footprint and counting speed of TokenCorpus against the `messages_set` lists
+##
+## usage : python -m scripts.report_token_store [SMSSpamCollection.txt] [scales]
+##
+## `scales` ( default 1,10,100 ) are corpus size multipliers; scale N adds randomly
+## drawn messages with shuffled tokens. The token lists go through a JSON round trip,
+## as `load_preprocessed` reads them from its cache, so every token is its own string.
+## Memory is what tracemalloc sees alive once each representation is built.
+
+import collections
+import gc
+import json
+import random
+import sys
+import tempfile
+import tracemalloc
+
+import nltk
+
+from spam_detector import TokenCorpus, Vocabulary, load_preprocessed
+from spam_detector.benchmark import timed
+
+
+def scaled(messages_set, scale, seed=0):
+    rng = random.Random(seed)
+    scaled_set = list(messages_set)
+    for _ in range(len(messages_set) * (scale - 1)):
+        tokens, label = rng.choice(messages_set)
+        tokens = list(tokens)
+        rng.shuffle(tokens)
+        scaled_set.append((tokens, label))
+    return json.dumps([[tokens, label] for (tokens, label) in scaled_set])
+
+
+def measure(text):
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    messages_set = [(tokens, label) for (tokens, label) in json.loads(text)]
+    lists_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    corpus = TokenCorpus.from_labeled(messages_set)
+    del messages_set
+    gc.collect()
+    corpus_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return lists_bytes, corpus_bytes
+
+
+def count_lists(messages_set):
+    'the training script : flattened word list, FreqDist, document frequencies from per-message sets'
+    all_words = []
+    for (message, label) in messages_set:
+        all_words.extend(message)
+    vocabulary = Vocabulary(nltk.FreqDist(all_words).keys())
+    document_frequency = collections.Counter(word for (message, label) in messages_set for word in set(message))
+    return vocabulary, document_frequency
+
+
+def count_corpus(corpus):
+    return corpus.build_vocabulary(), corpus.document_frequency()
+
+
+def main(path="SMSSpamCollection.txt", scales="1,10,100"):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        messages_set, _ = load_preprocessed(path, cache_dir=cache_dir)
+    print('%6s %9s %10s %12s %12s %8s %12s %12s' % ('scale', 'messages', 'tokens', 'lists MB', 'corpus MB', 'ratio',
+                                                     'lists count', 'corpus count'))
+    for scale in [int(scale) for scale in scales.split(",") if scale]:
+        text = scaled(messages_set, scale)
+        lists_bytes, corpus_bytes = measure(text)
+
+        documents = [(tokens, label) for (tokens, label) in json.loads(text)]
+        intern_time, corpus = timed(lambda: TokenCorpus.from_labeled(documents))
+        lists_time, (lists_vocabulary, lists_df) = timed(lambda: count_lists(documents))
+        corpus_time, (corpus_vocabulary, corpus_df) = timed(lambda: count_corpus(corpus))
+        if lists_vocabulary.words != corpus_vocabulary.words or any(
+                lists_df[word] != corpus_df[word_id] for word_id, word in enumerate(corpus.vocabulary.words)):
+            raise AssertionError("TokenCorpus counts differ from the word lists at scale %d" % scale)
+
+        print('%6d %9d %10d %12.1f %12.1f %7.1fx %10.3f s %10.3f s' % (
+            scale, len(corpus), len(corpus.token_ids), lists_bytes / 1e6, corpus_bytes / 1e6,
+            lists_bytes / float(corpus_bytes), lists_time, corpus_time))
+        print('%6s interning once : %.3f s' % ('', intern_time))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,90 @@
+## Throughput and accuracy of SMSTokenizer against nltk's word_tokenize on the spam dataset
+##
+## usage : python -m scripts.report_tokenizers [SMSSpamCollection.txt] [seed]
+##
+## Throughput is measured on the lower-cased messages alone. Agreement compares the
+## preprocessed token lists (stopwords removed, lemmatized, length filtered) with those
+## of word_tokenize, and accuracy is the test accuracy of a classifier trained on a
+## seeded 80/20 split with each tokenizer.
+
+import random
+import re
+import sys
+
+from nltk.tokenize import TweetTokenizer, regexp_tokenize, word_tokenize
+
+from spam_detector import (FeatureMatrix, Featurizer, NormalizationCache, Preprocessor, SMSTokenizer,
+                           VectorizedNaiveBayes, Vocabulary, accuracy, read_sms_collection)
+from spam_detector.benchmark import timed
+
+TOKENIZERS = [
+    ('word_tokenize', word_tokenize),
+    ('TweetTokenizer', TweetTokenizer().tokenize),
+    ('regexp_tokenize \\w+', lambda text: regexp_tokenize(text, r'\w+')),
+    ('SMSTokenizer', SMSTokenizer()),
+]
+
+SPECIAL_TOKENS = [
+    ('currency amounts', re.compile(r'^(?:[£$€]\d|\d+(?:\.\d+)?p$)')),
+    ('urls / domains / e-mail', re.compile(r'^(?:https?://|www\.)|\.(?:com|net|org|biz|info|co\.uk)\b|@')),
+    ('numbers / short codes', re.compile(r'^\+?\d[\d-]*$')),
+    ('emoticons / emoji', re.compile('^(?:[:;=]|<3|\\^)|^[\U0001F000-\U0001FAFF\u2600-\u27BF]$')),
+]
+
+
+def train_and_test(preprocessor, data_set, train_rows, test_rows):
+    documents = preprocessor.tokens_many(message for (message, label) in data_set)
+    vocabulary = Vocabulary.from_documents(documents[i] for i in train_rows)
+    featurizer = Featurizer(vocabulary, preprocessor)
+
+    def matrix(rows):
+        return FeatureMatrix.from_encoded([featurizer.encode_tokens(documents[i]) for i in rows],
+                                          [data_set[i][1] for i in rows])
+
+    classifier = VectorizedNaiveBayes.train_matrix(matrix(train_rows), vocabulary)
+    return documents, len(vocabulary), accuracy(classifier, matrix(test_rows))
+
+
+def main(path="SMSSpamCollection.txt", seed=0):
+    data_set = read_sms_collection(path)
+    texts = [message.lower() for (message, label) in data_set]
+
+    print('%-22s %12s %9s %10s' % ('tokenizer', 'messages/s', 'speedup', 'tokens'))
+    baseline = None
+    for name, tokenize in TOKENIZERS:
+        tokenize(texts[0])
+        seconds, n_tokens = timed(lambda: sum(len(tokenize(text)) for text in texts))
+        baseline = baseline or seconds
+        print('%-22s %12.0f %8.1fx %10d' % (name, len(texts) / seconds, baseline / seconds, n_tokens))
+
+    order = list(range(len(data_set)))
+    random.Random(int(seed)).shuffle(order)
+    slice_index = int(len(order) * .8)
+    train_rows, test_rows = order[:slice_index], order[slice_index:]
+
+    results = {}
+    for name in ('word', 'sms'):
+        preprocessor = Preprocessor(tokenizer=name, cache=NormalizationCache())
+        results[name] = train_and_test(preprocessor, data_set, train_rows, test_rows)
+
+    word_documents = results['word'][0]
+    print('\n%-22s %10s %10s %12s %12s' % ('preprocessing', 'words', 'accuracy', 'same tokens', 'jaccard'))
+    for name, (documents, n_words, test_accuracy) in sorted(results.items(), reverse=True):
+        same = sum(a == b for a, b in zip(documents, word_documents)) / float(len(documents))
+        jaccard = sum(len(set(a) & set(b)) / float(len(set(a) | set(b))) if a or b else 1.0
+                      for a, b in zip(documents, word_documents)) / len(documents)
+        print('%-22s %10d %9.2f%% %11.1f%% %12.3f' % ('tokenizer=%s' % name, n_words, 100 * test_accuracy,
+                                                      100 * same, jaccard))
+
+    print('\nspecial tokens kept whole by SMSTokenizer ( and by word_tokenize )')
+    sms_tokens = [token for document in results['sms'][0] for token in document]
+    word_tokens = [token for document in word_documents for token in document]
+    for name, pattern in SPECIAL_TOKENS:
+        sms_kept = [token for token in sms_tokens if pattern.search(token)]
+        word_kept = [token for token in word_tokens if pattern.search(token)]
+        print('  %-24s %6d ( %6d )   e.g. %s' % (name, len(sms_kept), len(word_kept),
+                                                 ' '.join(sorted(set(sms_kept), key=sms_kept.index)[:6])))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
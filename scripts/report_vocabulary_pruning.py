@@ -0,0 +1,82 @@
+## Accuracy vs vocabulary size vs scoring latency for several pruning settings
+##
+## usage : python -m scripts.report_vocabulary_pruning [SMSSpamCollection.txt] [seed]
+##
+## The selection is fitted on the 80% training split only, then the test split is scored.
+
+import os
+import random
+import sys
+import tempfile
+
+from spam_detector import (Featurizer, Preprocessor, VectorizedNaiveBayes, accuracy, build_feature_store,
+                           load_preprocessed, read_sms_collection)
+from spam_detector.benchmark import per_item, timed
+from spam_detector.feature_selection import remap_matrix, select_features
+from spam_detector.model_io import save_model
+
+SETTINGS = [
+    {},
+    {"min_df": 2},
+    {"min_df": 3},
+    {"min_df": 5},
+    {"max_features": 4000},
+    {"max_features": 2000},
+    {"max_features": 1000},
+    {"max_features": 500},
+    {"max_features": 2000, "score": "chi2"},
+    {"max_features": 1000, "score": "chi2"},
+    {"max_features": 500, "score": "chi2"},
+    {"max_features": 250, "score": "chi2"},
+    {"max_features": 1000, "score": "mutual_info"},
+    {"max_features": 500, "score": "mutual_info"},
+    {"max_features": 250, "score": "mutual_info"},
+]
+
+
+def describe(setting):
+    return ", ".join("%s=%s" % item for item in sorted(setting.items())) or "training words only"
+
+
+def main(path="SMSSpamCollection.txt", seed=0):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        messages_set, vocabulary = load_preprocessed(path, cache_dir=cache_dir)
+    data_set = read_sms_collection(path)
+
+    order = list(range(len(messages_set)))
+    random.Random(int(seed)).shuffle(order)
+    slice_index = int(len(order) * .8)
+    train_rows, test_rows = order[:slice_index], order[slice_index:]
+
+    featurizer = Featurizer(vocabulary, Preprocessor())
+    train = build_feature_store([messages_set[i][0] for i in train_rows], [messages_set[i][1] for i in train_rows],
+                                featurizer.encode_tokens)
+    test = build_feature_store([messages_set[i][0] for i in test_rows], [messages_set[i][1] for i in test_rows],
+                               featurizer.encode_tokens)
+    sample = [data_set[i][0] for i in test_rows[:300]]
+
+    print('%-36s %8s %9s %10s %14s %14s' % ('setting', 'words', 'accuracy', 'model KB', 'us/msg batch', 'us/msg single'))
+    for setting in SETTINGS:
+        pruned_vocabulary, id_map = select_features(train, vocabulary, **setting)
+        classifier = VectorizedNaiveBayes.train_matrix(remap_matrix(train, id_map), pruned_vocabulary)
+        pruned_test = remap_matrix(test, id_map)
+
+        batch_time, test_accuracy = timed(lambda: accuracy(classifier, pruned_test))
+        batch_time /= len(pruned_test)
+
+        single_featurizer = Featurizer(pruned_vocabulary, featurizer.preprocessor)
+        single_time = per_item(lambda message: classifier.classify(single_featurizer.featurize(message)), sample,
+                               repeats=1)
+
+        with tempfile.TemporaryDirectory() as model_dir:
+            model_path = os.path.join(model_dir, "model.nbm")
+            save_model(classifier, model_path)
+            model_size = os.path.getsize(model_path)
+
+        print('%-36s %8d %8.2f%% %10.1f %14.1f %14.1f' % (describe(setting), len(pruned_vocabulary),
+                                                         100 * test_accuracy, model_size / 1024.0,
+                                                         1e6 * batch_time, 1e6 * single_time))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
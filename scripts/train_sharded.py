@@ -0,0 +1,97 @@
+## Map-reduce training over shards of the corpus
+##
+## usage : python -m scripts.train_sharded count SMSSpamCollection.txt SHARD N_SHARDS table.npz
+##         python -m scripts.train_sharded merge model.nbm table-0.npz table-1.npz ...
+##         python -m scripts.train_sharded check [SMSSpamCollection.txt] [workers] [shards]
+##
+## `count` is the map step of one node : it preprocesses and counts shard SHARD
+## (0 based) of N_SHARDS consecutive shards. `merge` is the reduce step : the
+## tables must be given in shard order. `check` runs both locally with a process
+## pool standing in for the nodes and compares the model with single-process training.
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from spam_detector import (CountTable, FeatureMatrix, Featurizer, VectorizedNaiveBayes, Vocabulary,
+                           count_sharded, merge_count_tables, read_sms_collection)
+from spam_detector.benchmark import timed
+from spam_detector.model_io import save_model
+from spam_detector.preprocessing import Preprocessor, preprocessing_config
+from spam_detector.sharded import shard
+
+
+def count(path, shard_index, n_shards, output):
+    documents = shard(read_sms_collection(path), int(n_shards))[int(shard_index)]
+    preprocessor = Preprocessor()
+    table = CountTable.from_documents((preprocessor.tokens(message), label) for (message, label) in documents)
+    table.save(output)
+    print('%s -> %s' % (table, output))
+
+
+def merge(output, *tables):
+    table = merge_count_tables(CountTable.load(path) for path in tables)
+    ## - `count` preprocesses with the default settings
+    save_model(table.to_classifier(), output, preprocessing=preprocessing_config())
+    print('%s -> %s' % (table, output))
+
+
+def identical(a, b):
+    'bit-identical labels, vocabulary and probability arrays'
+    return (a.labels() == b.labels() and a.vocabulary.words == b.vocabulary.words and
+            all(np.array_equal(getattr(a, name), getattr(b, name))
+                for name in ("log_prior", "log_present", "log_absent", "feature_counts", "label_counts")))
+
+
+def check(path="SMSSpamCollection.txt", workers=4, n_shards=8):
+    workers, n_shards = int(workers), int(n_shards)
+    data_set = read_sms_collection(path)
+
+    def train_single():
+        preprocessor = Preprocessor()
+        messages_set = [(preprocessor.tokens(message), label) for (message, label) in data_set]
+        vocabulary = Vocabulary.from_documents(tokens for (tokens, label) in messages_set)
+        featurizer = Featurizer(vocabulary, preprocessor)
+        matrix = FeatureMatrix.from_encoded([featurizer.encode_tokens(tokens) for (tokens, label) in messages_set],
+                                            [label for (tokens, label) in messages_set])
+        return VectorizedNaiveBayes.train_matrix(matrix, vocabulary)
+
+    def count_and_merge():
+        tables = count_sharded(data_set, n_shards, workers, preprocess={})
+        return tables, merge_count_tables(tables).to_classifier()
+
+    single_time, single = timed(train_single)
+    sharded_time, (tables, sharded) = timed(count_and_merge)
+
+    ## - round trip the tables through files, as if they came from other machines
+    with tempfile.TemporaryDirectory() as table_dir:
+        paths = []
+        for i, table in enumerate(tables):
+            paths.append(os.path.join(table_dir, 'table-%d.npz' % i))
+            table.save(paths[-1])
+        loaded = [CountTable.load(table_path) for table_path in paths]
+        table_bytes = sum(os.path.getsize(table_path) for table_path in paths)
+    from_files = merge_count_tables(loaded).to_classifier()
+
+    sequential = tables[0]
+    for table in tables[1:]:
+        sequential = sequential.merge(table)
+
+    print('messages                     : ', len(data_set))
+    print('shards / workers             : ', '%d / %d' % (len(tables), workers))
+    print('single process (s)           : ', '%.3f' % single_time)
+    print('sharded, preprocessing incl. : ', '%.3f' % sharded_time)
+    print('count tables on disk (KB)    : ', '%.1f' % (table_bytes / 1024.0))
+    print('tree merge == sequential     : ', merge_count_tables(tables) == sequential)
+    print('bit-identical to single      : ', identical(single, sharded))
+    print('bit-identical via files      : ', identical(single, from_files))
+
+
+COMMANDS = {"count": count, "merge": merge, "check": check}
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        sys.exit('usage : python -m scripts.train_sharded {count,merge,check} ...')
+    COMMANDS[sys.argv[1]](*sys.argv[2:])
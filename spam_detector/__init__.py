@@ -0,0 +1,17 @@
+## Spam detector built on the NLTK Naive Bayes classifier
+
+from spam_detector.datasets import SMSCorpus, iter_corpus, load_corpus, read_sms_collection
+from spam_detector.preprocessing import Featurizer, Preprocessor, SMSTokenizer, WordTokenizer
+from spam_detector.token_cache import NormalizationCache
+from spam_detector.features import FeatureEncoder, FeatureMatrix, LazyFeatureMatrix, Vocabulary, build_feature_store
+from spam_detector.token_store import TokenCorpus
+from spam_detector.splits import cross_validate, fold_ids, kfold, train_test_split
+from spam_detector.naive_bayes import VectorizedNaiveBayes
+from spam_detector.multinomial import ComplementNaiveBayes, MultinomialNaiveBayes
+from spam_detector.batch import BatchClassifier
+from spam_detector.parallel import preprocess_parallel
+from spam_detector.artifacts import clear_cache, load_preprocessed
+from spam_detector.model_io import load_model, save_model
+from spam_detector.evaluation import accuracy, evaluate, format_report
+from spam_detector.hashing import BucketVocabulary, HashingFeaturizer, merge_hashed
+from spam_detector.sharded import CountTable, count_sharded, merge_count_tables, train_sharded
@@ -0,0 +1,140 @@
+## On-disk cache of the preprocessed corpus, keyed by dataset content and preprocessing config
+
+import gc
+import hashlib
+import json
+import os
+
+import nltk
+
+from spam_detector.datasets import read_sms_collection
+from spam_detector.features import Vocabulary
+from spam_detector.parallel import preprocess_parallel
+from spam_detector.preprocessing import preprocessing_config
+
+## - bump whenever a change to the reader or the preprocessing changes its output
+PREPROCESSING_VERSION = 1
+DEFAULT_CACHE_DIR = ".spam_detector_cache"
+
+
+def file_hash(path, block_size=1 << 20):
+    'returns the sha256 hex digest of the file content'
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(dataset_hash, config):
+    'combines the dataset hash, the preprocessing config and the code versions into one key'
+    description = {
+        "dataset": dataset_hash,
+        "config": config,
+        "version": PREPROCESSING_VERSION,
+        "nltk": nltk.__version__,
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def corpus_prefix(path):
+    'the file name prefix of the cache entries of a dataset, from its absolute path'
+    return "preprocessed-%s-" % hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+
+
+def cache_path(cache_dir, prefix, dataset_hash, key):
+    return os.path.join(cache_dir, "%s%s-%s.json" % (prefix, dataset_hash[:16], key[:32]))
+
+
+def remove_stale(cache_dir, prefix, dataset_hash):
+    'deletes the entries of the dataset built from an earlier version of its content'
+    current = "%s%s-" % (prefix, dataset_hash[:16])
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix) and not name.startswith(current):
+            os.remove(os.path.join(cache_dir, name))
+
+
+def clear_cache(cache_dir=DEFAULT_CACHE_DIR, path=None):
+    '''deletes the cached preprocessed corpora, or only those of the dataset at `path`
+
+    Returns the number of files removed. `load_preprocessed` already drops the
+    entries of a dataset whose content changed; entries of every config used
+    on the current content are kept until this is called.
+    '''
+    if not os.path.isdir(cache_dir):
+        return 0
+    prefix = "preprocessed-" if path is None else corpus_prefix(path)
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix) and (name.endswith(".json") or name.endswith(".tmp")):
+            os.remove(os.path.join(cache_dir, name))
+            removed += 1
+    return removed
+
+
+def build_artifact(path, config, workers=1):
+    'preprocesses the dataset, returns (messages_set, vocabulary)'
+    data_set = read_sms_collection(path)
+    documents = preprocess_parallel([message for (message, label) in data_set], workers=workers, **config)
+    messages_set = [(tokens, label) for tokens, (message, label) in zip(documents, data_set)]
+    return messages_set, Vocabulary.from_documents(documents)
+
+
+def save_artifact(path, key, config, messages_set, vocabulary):
+    artifact = {
+        "version": PREPROCESSING_VERSION,
+        "key": key,
+        "config": config,
+        "labels": [label for (tokens, label) in messages_set],
+        "documents": [tokens for (tokens, label) in messages_set],
+        "vocabulary": vocabulary.words,
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def read_artifact(path, key):
+    'returns (messages_set, vocabulary) of a cache file, or None if it is missing or stale'
+    ## - the cyclic collector would otherwise rescan the thousands of new token lists while loading
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, encoding="utf-8") as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        return None
+    finally:
+        if gc_enabled:
+            gc.enable()
+    if artifact.get("version") != PREPROCESSING_VERSION or artifact.get("key") != key:
+        return None
+    messages_set = list(zip(artifact["documents"], artifact["labels"]))
+    return messages_set, Vocabulary(artifact["vocabulary"])
+
+
+def load_preprocessed(path="SMSSpamCollection.txt", cache_dir=DEFAULT_CACHE_DIR, stem=False, min_length=3,
+                      language="english", pos="v", tokenizer="word", workers=1, rebuild=False):
+    '''returns (messages_set, vocabulary) of the dataset, from the cache when it is up to date
+
+    The cache file is keyed by the sha256 of the dataset and the preprocessing
+    config, so editing the dataset or changing stem/min_length/language/tokenizer
+    makes the next call rebuild it automatically. Rebuilding after the dataset
+    changed deletes its entries for the old content; `clear_cache` deletes the rest.
+    '''
+    config = preprocessing_config(stem, min_length, language, pos, tokenizer)
+    dataset_hash = file_hash(path)
+    key = cache_key(dataset_hash, config)
+    prefix = corpus_prefix(path)
+    artifact_path = cache_path(cache_dir, prefix, dataset_hash, key)
+    if not rebuild:
+        cached = read_artifact(artifact_path, key)
+        if cached is not None:
+            return cached
+
+    messages_set, vocabulary = build_artifact(path, config, workers=workers)
+    os.makedirs(cache_dir, exist_ok=True)
+    remove_stale(cache_dir, prefix, dataset_hash)
+    save_artifact(artifact_path, key, config, messages_set, vocabulary)
+    return messages_set, vocabulary
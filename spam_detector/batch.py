@@ -0,0 +1,99 @@
+## Batch scoring of raw SMS messages
+
+from time import perf_counter
+
+import numpy as np
+
+from spam_detector import instrumentation
+from spam_detector.hashing import BucketVocabulary, HashingFeaturizer
+from spam_detector.preprocessing import Featurizer, Preprocessor
+from spam_detector.token_cache import NormalizationCache
+
+
+class BatchClassifier(object):
+    '''featurizes and scores raw messages in batches of `batch_size`
+
+    Within a batch every distinct message is featurized once, token
+    normalization goes through a shared `NormalizationCache`, and the whole
+    batch is scored with one call to the classifier. Messages go through the
+    same `Featurizer.featurize` path as the training data, with the preprocessing
+    settings saved in the model (the defaults otherwise). The classifier must
+    provide `labels()`, `vocabulary` and `probabilities_many`, as
+    `VectorizedNaiveBayes` does.
+    '''
+
+    def __init__(self, classifier, featurizer=None, batch_size=1000, positive_label="spam"):
+        if batch_size <= 0:
+            raise ValueError("batch_size must be positive, got %r" % (batch_size,))
+        self.classifier = classifier
+        if featurizer is None:
+            ## - the settings the model was trained with, when it was saved with them
+            config = getattr(classifier, "preprocessing", None) or {}
+            preprocessor = Preprocessor(cache=NormalizationCache(), **config)
+            if isinstance(classifier.vocabulary, BucketVocabulary):
+                featurizer = HashingFeaturizer.from_vocabulary(classifier.vocabulary, preprocessor)
+            else:
+                featurizer = Featurizer(classifier.vocabulary, preprocessor,
+                                        counts=getattr(classifier, "term_counts", False))
+        self.featurizer = featurizer
+        self.batch_size = batch_size
+        self.labels = classifier.labels()
+        self.positive_column = self.labels.index(positive_label)
+
+    def encode_batch(self, messages):
+        'returns the feature ids of every message, featurizing each distinct message once'
+        featurize = self.featurizer.featurize
+        seen = {}
+        encoded = []
+        for message in messages:
+            ids = seen.get(message)
+            if ids is None:
+                ids = seen[message] = featurize(message)
+            encoded.append(ids)
+        return encoded
+
+    def score_batch(self, messages):
+        'returns (labels, positive label probabilities) of a single batch of raw messages'
+        started = perf_counter() if instrumentation.ENABLED else None
+        probabilities = self.classifier.probabilities_many(self.encode_batch(messages))
+        labels = self.labels
+        predicted = [labels[i] for i in probabilities.argmax(axis=1)]
+        if started is not None:
+            instrumentation.record("score_batch", perf_counter() - started, len(messages))
+        return predicted, probabilities[:, self.positive_column]
+
+    def iter_batches(self, messages):
+        'yields (messages, labels, positive label probabilities) for every batch of the iterable'
+        batch = []
+        for message in messages:
+            batch.append(message)
+            if len(batch) == self.batch_size:
+                yield (batch,) + self.score_batch(batch)
+                batch = []
+        if batch:
+            yield (batch,) + self.score_batch(batch)
+
+    def score_many(self, messages):
+        'returns (labels, positive label probabilities) for an iterable of raw messages'
+        labels = []
+        probabilities = []
+        for batch, batch_labels, batch_probabilities in self.iter_batches(messages):
+            labels.extend(batch_labels)
+            probabilities.append(batch_probabilities)
+        if not probabilities:
+            return labels, np.empty(0)
+        return labels, np.concatenate(probabilities)
+
+    def classify_many(self, messages):
+        return self.score_many(messages)[0]
+
+    def spam_probabilities(self, messages):
+        '''returns the array of positive label (spam) probabilities of the messages
+
+        Unlike the `prob_classify_many` of nltk classifiers, which gives a
+        ProbDist per message, this is one float per message.
+        '''
+        return self.score_many(messages)[1]
+
+    def classify(self, message):
+        return self.score_batch([message])[0][0]
@@ -0,0 +1,220 @@
+## Benchmark suite : times every pipeline stage and compares with a stored baseline
+##
+## usage : python -m spam_detector.benchmark [--dataset SMSSpamCollection.txt] [--scales 1,4]
+##                                           [--repeats 3] [--output results.json]
+##                                           [--baseline baseline.json] [--tolerance 0.25]
+##
+## Scale 1 is the dataset itself, scale N a synthetic corpus N times its size made of
+## randomly drawn messages with shuffled words. Every stage runs `repeats` times and
+## its best time is kept. With --baseline, stages more than `tolerance` slower than in
+## the baseline, and evaluation metrics that changed, are reported and the exit status is 1.
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from spam_detector.batch import BatchClassifier
+from spam_detector.datasets import load_corpus
+from spam_detector.evaluation import evaluate
+from spam_detector.features import FeatureMatrix, Vocabulary
+from spam_detector.model_io import load_model, save_model
+from spam_detector.naive_bayes import VectorizedNaiveBayes
+from spam_detector.preprocessing import Featurizer, Preprocessor
+
+STAGES = ("load", "preprocess", "vocabulary", "features", "train", "classify_single", "classify_batch", "evaluate",
+          "save", "load_model")
+SINGLE_SAMPLE = 500
+METRICS = ("accuracy", "f1", "roc_auc")
+
+
+def synthetic_corpus(pairs, scale, seed=0):
+    '''returns `scale` times as many (message, label) pairs as `pairs`
+
+    The original pairs come first; the rest are drawn at random with their
+    words shuffled, so message lengths, vocabulary and label balance stay
+    realistic while the text differs from the original messages.
+    '''
+    if scale <= 1:
+        return list(pairs)
+    rng = random.Random(seed)
+    synthetic = list(pairs)
+    for _ in range(len(pairs) * (scale - 1)):
+        message, label = rng.choice(pairs)
+        words = message.split(" ")
+        rng.shuffle(words)
+        synthetic.append((" ".join(words), label))
+    return synthetic
+
+
+def write_corpus(pairs, path):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for message, label in pairs:
+            f.write("%s\t%s\n" % (label, message))
+
+
+def timed(function, repeats=1):
+    'returns (best seconds, result of the last run) of `repeats` calls of function(), the timer of scripts/ too'
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def per_item(function, items, repeats=3):
+    'returns the best mean seconds per item of calling function(item) on every item, over `repeats` passes'
+    items = list(items)
+
+    def run():
+        for item in items:
+            function(item)
+
+    seconds, _ = timed(run, repeats)
+    return seconds / len(items) if items else 0.0
+
+
+def run_scale(dataset, scale, repeats, work_dir):
+    'returns {stage: {"seconds": ..., "items": ..., "items_per_second": ...}} for one corpus size'
+    path = os.path.join(work_dir, "corpus-x%d.txt" % scale)
+    write_corpus(synthetic_corpus(load_corpus(dataset).pairs(), scale), path)
+    results = {}
+
+    def record(stage, function, items):
+        seconds, result = timed(function, repeats)
+        results[stage] = {"seconds": seconds, "items": items, "items_per_second": items / seconds if seconds else 0.0}
+        return result
+
+    corpus = record("load", lambda: load_corpus(path), os.path.getsize(path))
+    results["load"]["unit"] = "bytes"
+    messages, labels = corpus.messages, [label for (message, label) in corpus]
+
+    ## - a fresh Preprocessor per run, so the normalization cache does not carry over between repeats
+    documents = record("preprocess", lambda: Preprocessor().tokens_many(messages), len(messages))
+    vocabulary = record("vocabulary", lambda: Vocabulary.from_documents(documents), len(documents))
+    featurizer = Featurizer(vocabulary)
+    matrix = record("features", lambda: FeatureMatrix.from_encoded([featurizer.encode_tokens(tokens)
+                                                                    for tokens in documents], labels), len(documents))
+    classifier = record("train", lambda: VectorizedNaiveBayes.train_matrix(matrix, vocabulary), len(matrix))
+
+    sample = messages[:SINGLE_SAMPLE]
+    record("classify_single", lambda: [classifier.classify(featurizer.featurize(message)) for message in sample],
+           len(sample))
+    record("classify_batch", lambda: BatchClassifier(classifier).classify_many(messages), len(messages))
+    ## - metrics on the training data, only there to catch a change in the model's predictions
+    metrics = record("evaluate", lambda: evaluate(classifier, matrix), len(matrix))
+    results["evaluate"].update((name, metrics.get(name)) for name in METRICS)
+
+    model_path = os.path.join(work_dir, "model-x%d.nbm" % scale)
+    record("save", lambda: save_model(classifier, model_path), 1)
+    record("load_model", lambda: load_model(model_path), 1)
+    results["save"]["bytes"] = os.path.getsize(model_path)
+    return results
+
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "processor": platform.processor(), "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+
+def run_suite(dataset="SMSSpamCollection.txt", scales=(1, 4), repeats=3):
+    'runs every stage at every scale, returns the JSON-ready report'
+    report = {"environment": environment(), "dataset": dataset, "repeats": repeats, "results": {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for scale in scales:
+            report["results"]["x%d" % scale] = run_scale(dataset, scale, repeats, work_dir)
+    return report
+
+
+def compare(report, baseline):
+    '''returns [(scale, stage, baseline seconds, seconds, ratio)] for every stage found in both
+
+    Stages or scales missing from either report are skipped.
+    '''
+    rows = []
+    for scale, stages in sorted(report["results"].items()):
+        old_stages = baseline.get("results", {}).get(scale, {})
+        for stage in STAGES:
+            if stage in stages and stage in old_stages and old_stages[stage]["seconds"] > 0:
+                old, new = old_stages[stage]["seconds"], stages[stage]["seconds"]
+                rows.append((scale, stage, old, new, new / old))
+    return rows
+
+
+def changed_metrics(report, baseline):
+    '''returns [(scale, metric, baseline value, value)] for the evaluation metrics that moved
+
+    A speed-up that changes the model's predictions shows up here even when
+    every stage got faster.
+    '''
+    rows = []
+    for scale, stages in sorted(report["results"].items()):
+        old = baseline.get("results", {}).get(scale, {}).get("evaluate", {})
+        new = stages.get("evaluate", {})
+        for metric in METRICS:
+            if old.get(metric) is not None and new.get(metric) is not None and abs(old[metric] - new[metric]) > 1e-9:
+                rows.append((scale, metric, old[metric], new[metric]))
+    return rows
+
+
+def print_report(report, comparison=None, tolerance=0.25, output=sys.stdout):
+    ratios = dict(((scale, stage), ratio) for (scale, stage, old, new, ratio) in comparison or ())
+    for scale, stages in sorted(report["results"].items(), key=lambda item: int(item[0][1:])):
+        print("%s" % scale, file=output)
+        for stage in STAGES:
+            result = stages[stage]
+            line = "  %-16s %10.2f ms %14.1f %s/s" % (stage, 1e3 * result["seconds"], result["items_per_second"],
+                                                     result.get("unit", "items"))
+            if "accuracy" in result:
+                line += "   accuracy %.4f" % result["accuracy"]
+            if (scale, stage) in ratios:
+                ratio = ratios[(scale, stage)]
+                line += "   %5.2fx baseline%s" % (ratio, "   SLOWER" if ratio > 1 + tolerance else "")
+            print(line, file=output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the spam detector pipeline")
+    parser.add_argument("--dataset", default="SMSSpamCollection.txt")
+    parser.add_argument("--scales", default="1,4", help="comma separated corpus size multipliers")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per stage, the best is kept")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative slowdown against the baseline reported as a regression")
+    args = parser.parse_args(argv)
+
+    scales = [int(scale) for scale in args.scales.split(",") if scale]
+    report = run_suite(args.dataset, scales, args.repeats)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    comparison = changed = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison, changed = compare(report, baseline), changed_metrics(report, baseline)
+    print_report(report, comparison, args.tolerance)
+
+    status = 0
+    regressions = [row for row in comparison or () if row[4] > 1 + args.tolerance]
+    if regressions:
+        print("\n%d stage(s) slower than the baseline by more than %d%%" % (len(regressions), 100 * args.tolerance))
+        status = 1
+    for scale, metric, old, new in changed or ():
+        print("%s %s changed : %.6f in the baseline, now %.6f" % (scale, metric, old, new))
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
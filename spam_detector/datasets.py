@@ -0,0 +1,135 @@
+## Readers for the SMS spam datasets bundled with the project
+
+import csv
+import mmap as mmap_module
+from array import array
+
+import numpy as np
+
+
+class SMSCorpus(object):
+    '''the messages and labels of a dataset as two compact columns
+
+    `messages` is a list of strings; `labels` is an array of small ints
+    indexing `label_names`, which are numbered in first-seen order. Indexing
+    and iteration give (message, label) tuples, as `read_sms_collection` does.
+    '''
+
+    def __init__(self, messages, labels, label_names):
+        self.messages = messages
+        self.labels = labels
+        self.label_names = label_names
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        'builds the columns in one pass over (message, label) pairs'
+        messages = []
+        label_ids = array('i')
+        label_index = {}
+        label_names = []
+        append_message = messages.append
+        append_label = label_ids.append
+        for message, label in pairs:
+            label_id = label_index.get(label)
+            if label_id is None:
+                label_id = label_index[label] = len(label_names)
+                label_names.append(label)
+            append_message(message)
+            append_label(label_id)
+        dtype = np.uint8 if len(label_names) <= 256 else np.int32
+        return cls(messages, np.frombuffer(label_ids, dtype=np.int32).astype(dtype), label_names)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return SMSCorpus(self.messages[i], self.labels[i], self.label_names)
+        return self.messages[i], self.label_names[self.labels[i]]
+
+    def __iter__(self):
+        names = self.label_names
+        return zip(self.messages, (names[label] for label in self.labels.tolist()))
+
+    def pairs(self):
+        'returns the list of (message, label) tuples'
+        return list(self)
+
+    def label_counts(self):
+        'returns {label: number of messages}'
+        counts = np.bincount(self.labels, minlength=len(self.label_names)).tolist()
+        return dict(zip(self.label_names, counts))
+
+    def __repr__(self):
+        return '<SMSCorpus %d messages, %s>' % (len(self), ", ".join("%s: %d" % item
+                                                                       for item in self.label_counts().items()))
+
+
+def _lines(path, encoding, mmap):
+    'yields the decoded lines of the file, line endings included, split on "\\n" only'
+    with open(path, "rb") as f:
+        if not mmap:
+            for line in f:
+                yield line.decode(encoding)
+            return
+        try:
+            mapped = mmap_module.mmap(f.fileno(), 0, access=mmap_module.ACCESS_READ)
+        except ValueError:
+            ## - empty files cannot be mapped
+            return
+        with mapped:
+            for line in iter(mapped.readline, b""):
+                yield line.decode(encoding)
+
+
+def _split_line(line, line_number):
+    label, tab, message = line.rstrip("\r\n").partition("\t")
+    if not tab:
+        raise ValueError("line %d is not `label<TAB>message` : %r" % (line_number, line[:80]))
+    return message, label
+
+
+def iter_sms_collection(path="SMSSpamCollection.txt", encoding="utf-8", mmap=False):
+    '''lazily yields the (message, label) tuples of a tab separated label/message file
+
+    SMS text is taken literally, quote characters are part of the message.
+    With `mmap` the file is memory-mapped instead of read through a buffer.
+    '''
+    for line_number, line in enumerate(_lines(path, encoding, mmap), 1):
+        if line.rstrip("\r\n"):
+            yield _split_line(line, line_number)
+
+
+def iter_sms_csv(path="spam_dataset.csv", encoding="utf-8", mmap=False):
+    '''lazily yields the (message, label) tuples of a CSV file with `label` and `message` columns
+
+    Quoted messages may contain commas, quotes and line breaks.
+    '''
+    reader = csv.reader(_lines(path, encoding, mmap))
+    header = next(reader, None)
+    if header is None:
+        return
+    try:
+        label_column, message_column = header.index("label"), header.index("message")
+    except ValueError:
+        raise ValueError("%s has no `label` and `message` columns, header is %r" % (path, header))
+    for row in reader:
+        if row:
+            yield row[message_column], row[label_column]
+
+
+def iter_corpus(path, encoding="utf-8", mmap=False):
+    'lazily yields (message, label) tuples, of a CSV file if `path` ends with .csv, else of a label/message file'
+    if str(path).lower().endswith(".csv"):
+        return iter_sms_csv(path, encoding, mmap)
+    return iter_sms_collection(path, encoding, mmap)
+
+
+def load_corpus(path="SMSSpamCollection.txt", encoding="utf-8", mmap=False):
+    'reads a whole dataset in one streaming pass into an SMSCorpus'
+    return SMSCorpus.from_pairs(iter_corpus(path, encoding, mmap))
+
+
+def read_sms_collection(path="SMSSpamCollection.txt", encoding="utf-8"):
+    'reads a tab separated label/message file into a list of (message, label) tuples'
+    return load_corpus(path, encoding).pairs()
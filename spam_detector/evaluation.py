@@ -0,0 +1,204 @@
+## Evaluation of a trained classifier on an encoded split
+
+import time
+
+import numpy as np
+
+from spam_detector import instrumentation
+
+
+def accuracy(classifier, gold):
+    'fraction of correctly classified messages of a FeatureMatrix, LazyFeatureMatrix or list of (ids, label)'
+    if hasattr(gold, "iter_blocks"):
+        predicted = classifier.classify_many(gold)
+        expected = gold.labels
+    else:
+        gold = list(gold)
+        predicted = classifier.classify_many([ids for (ids, label) in gold])
+        expected = [label for (ids, label) in gold]
+    if not expected:
+        return 0.0
+    return float(np.mean(np.asarray(predicted, dtype=object) == np.asarray(expected, dtype=object)))
+
+
+def log_scores(classifier, gold):
+    '''returns (labels, (n_messages, n_labels) log2 scores, expected labels) of a split, in one batched pass
+
+    Vectorized classifiers score a FeatureMatrix, LazyFeatureMatrix or list of
+    (ids, label) directly; other nltk classifiers get a list of
+    (featureset, label) and go through `prob_classify_many`.
+    '''
+    if hasattr(gold, "iter_blocks"):
+        featuresets, expected = gold, list(gold.labels)
+    else:
+        gold = list(gold)
+        featuresets, expected = [features for (features, label) in gold], [label for (features, label) in gold]
+    labels = list(classifier.labels())
+    if hasattr(classifier, "log_scores_many"):
+        return labels, classifier.log_scores_many(featuresets), expected
+    scores = np.array([[dist.logprob(label) for label in labels]
+                       for dist in classifier.prob_classify_many(featuresets)]).reshape(-1, len(labels))
+    return labels, scores, expected
+
+
+def log_odds(scores, column):
+    'returns log2 P(label) / P(other labels) of every row of unnormalized log2 scores'
+    others = np.delete(scores, column, axis=1)
+    top = others.max(axis=1)
+    return scores[:, column] - (top + np.log2(np.exp2(others - top[:, None]).sum(axis=1)))
+
+
+def confusion_matrix(expected, predicted, labels):
+    'returns the (n_labels, n_labels) counts, rows are the expected labels and columns the predicted ones'
+    index = dict(zip(labels, range(len(labels))))
+    expected = np.fromiter((index[label] for label in expected), dtype=np.intp, count=len(expected))
+    predicted = np.fromiter((index[label] for label in predicted), dtype=np.intp, count=len(predicted))
+    return np.bincount(expected * len(labels) + predicted, minlength=len(labels) ** 2).reshape(len(labels),
+                                                                                                len(labels))
+
+
+def _ratio(numerator, denominator):
+    return float(numerator) / float(denominator) if denominator else 0.0
+
+
+def _ranked_counts(positive, scores):
+    'returns (false positives, true positives, thresholds) for every distinct score, highest first'
+    order = np.argsort(-scores, kind="mergesort")
+    scores, positive = scores[order], positive[order]
+    ## - the last message of each run of equal scores closes a threshold
+    last = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1]
+    true_positives = np.cumsum(positive)[last]
+    return last + 1 - true_positives, true_positives, scores[last]
+
+
+def roc_curve(positive, scores):
+    '''returns (false positive rates, true positive rates, thresholds) of `scores >= threshold`
+
+    `positive` is a boolean array of the true class of every message. The
+    first point, threshold +inf, flags nothing.
+    '''
+    positive = np.asarray(positive, dtype=bool)
+    false_positives, true_positives, thresholds = _ranked_counts(positive, np.asarray(scores, dtype=np.float64))
+    n_positive, n_negative = true_positives[-1], false_positives[-1]
+    if not n_positive or not n_negative:
+        raise ValueError("a ROC curve needs both positive and negative messages")
+    return (np.r_[0.0, false_positives / float(n_negative)], np.r_[0.0, true_positives / float(n_positive)],
+            np.r_[np.inf, thresholds])
+
+
+def precision_recall_curve(positive, scores):
+    '''returns (precisions, recalls, thresholds) of `scores >= threshold`, highest threshold first
+
+    The first point, threshold +inf, has recall 0 and precision 1.
+    '''
+    positive = np.asarray(positive, dtype=bool)
+    false_positives, true_positives, thresholds = _ranked_counts(positive, np.asarray(scores, dtype=np.float64))
+    if not true_positives[-1]:
+        raise ValueError("a precision / recall curve needs positive messages")
+    return (np.r_[1.0, true_positives / (true_positives + false_positives).astype(np.float64)],
+            np.r_[0.0, true_positives / float(true_positives[-1])], np.r_[np.inf, thresholds])
+
+
+def area_under_curve(x, y):
+    'trapezoidal area under the points (x, y), x sorted'
+    x, y = np.asarray(x), np.asarray(y)
+    return float(np.sum(np.diff(x) * (y[1:] + y[:-1]) / 2))
+
+
+def average_precision(precisions, recalls):
+    'the precision at every threshold weighted by the recall it adds, as scikit-learn defines it'
+    return float(np.sum(np.diff(recalls) * precisions[1:]))
+
+
+def threshold_for_fpr(positive, scores, max_fpr):
+    '''returns (threshold, false positive rate, true positive rate) of the lowest threshold within `max_fpr`
+
+    Flagging the messages with `scores >= threshold` then catches as many
+    positives as possible without exceeding the false positive rate.
+    '''
+    false_positive_rates, true_positive_rates, thresholds = roc_curve(positive, scores)
+    ## - rates only grow as the threshold decreases, so the last point within the target is the best one
+    best = np.searchsorted(false_positive_rates, max_fpr, side="right") - 1
+    return float(thresholds[best]), float(false_positive_rates[best]), float(true_positive_rates[best])
+
+
+def evaluate(classifier, gold, positive="spam", max_fpr=0.01):
+    '''scores a split in one batched pass, returns a JSON-ready report
+
+    Accuracy, the confusion matrix, precision / recall / F1 of the `positive`
+    label, ROC AUC, average precision and the log2 odds threshold that keeps
+    the false positive rate within `max_fpr`, with the time the pass took.
+    Curves are ranked on the log2 odds of `positive`, which separate messages
+    that probabilities would round to exactly 1.0. The curves themselves are
+    available from `roc_curve` and `precision_recall_curve`.
+    '''
+    if not hasattr(gold, "iter_blocks"):
+        gold = list(gold)
+    start = time.perf_counter()
+    with instrumentation.stage("evaluate", len(gold)):
+        labels, scores, expected = log_scores(classifier, gold)
+        report = _metrics(labels, scores, expected, positive, max_fpr)
+    seconds = time.perf_counter() - start
+    report.update({"seconds": seconds, "messages_per_second": _ratio(len(expected), seconds)})
+    return report
+
+
+def _metrics(labels, scores, expected, positive, max_fpr):
+    predicted = [labels[i] for i in scores.argmax(axis=1)] if len(expected) else []
+    ## - labels the classifier never saw in training still get a row
+    labels = labels + sorted(set(expected) - set(labels), key=expected.index)
+    matrix = confusion_matrix(expected, predicted, labels)
+    report = {
+        "messages": len(expected),
+        "accuracy": _ratio(np.trace(matrix), matrix.sum()),
+        "labels": labels,
+        "confusion_matrix": matrix.tolist(),
+        "positive": positive,
+    }
+    if positive not in labels:
+        return report
+
+    column = labels.index(positive)
+    true_positives = int(matrix[column, column])
+    precision = _ratio(true_positives, matrix[:, column].sum())
+    recall = _ratio(true_positives, matrix[column].sum())
+    report.update({"precision": precision, "recall": recall,
+                   "f1": _ratio(2 * precision * recall, precision + recall)})
+
+    is_positive = np.asarray(expected, dtype=object) == positive
+    if is_positive.all() or not is_positive.any() or column >= scores.shape[1]:
+        return report
+    odds = log_odds(scores, column)
+    false_positive_rates, true_positive_rates, thresholds = roc_curve(is_positive, odds)
+    precisions, recalls, thresholds = precision_recall_curve(is_positive, odds)
+    threshold, fpr, tpr = threshold_for_fpr(is_positive, odds, max_fpr)
+    report.update({
+        "roc_auc": area_under_curve(false_positive_rates, true_positive_rates),
+        "average_precision": average_precision(precisions, recalls),
+        "max_fpr": max_fpr,
+        "threshold": {"log2_odds": threshold, "probability": float(1 / (1 + np.exp2(-threshold))),
+                      "fpr": fpr, "tpr": tpr},
+    })
+    return report
+
+
+def format_report(report):
+    'returns the report of `evaluate` as readable text'
+    lines = ['%d messages, %.1f ms, %.0f messages/s' % (report["messages"], 1e3 * report["seconds"],
+                                                          report["messages_per_second"]),
+             'accuracy          : %.4f' % report["accuracy"],
+             'confusion matrix  : rows expected, columns predicted']
+    width = max(len(str(label)) for label in report["labels"]) + 2
+    lines.append(' ' * (20 + width) + ''.join('%*s' % (width + 6, label) for label in report["labels"]))
+    for label, row in zip(report["labels"], report["confusion_matrix"]):
+        lines.append(' ' * 20 + '%*s' % (width, label) + ''.join('%*d' % (width + 6, count) for count in row))
+    if "precision" in report:
+        lines.append('%-18s: precision %.4f, recall %.4f, F1 %.4f' % (report["positive"], report["precision"],
+                                                                      report["recall"], report["f1"]))
+    if "roc_auc" in report:
+        threshold = report["threshold"]
+        lines.append('ROC AUC           : %.4f, average precision %.4f' % (report["roc_auc"],
+                                                                           report["average_precision"]))
+        lines.append('FPR <= %-11s: flag at log2 odds >= %.2f ( P >= %.4f ), FPR %.4f, recall %.4f' % (
+            report["max_fpr"], threshold["log2_odds"], threshold["probability"], threshold["fpr"], threshold["tpr"]))
+    return '\n'.join(lines)
@@ -0,0 +1,89 @@
+## Vocabulary pruning and feature selection
+
+from functools import partial
+
+import numpy as np
+
+from spam_detector.features import FeatureMatrix, LazyFeatureMatrix, Vocabulary, matrix_blocks
+from spam_detector.naive_bayes import count_matrix
+
+SCORES = ("chi2", "mutual_info")
+
+
+def feature_scores(matrix, n_features, score="chi2"):
+    '''scores every word by how strongly its presence depends on the label
+
+    `chi2` is the chi-square statistic and `mutual_info` the mutual information
+    (in bits) of the word presence x label contingency table.
+    '''
+    labels, present, label_counts = count_matrix(matrix, n_features)
+    present, label_counts = present.astype(np.float64), label_counts.astype(np.float64)
+    n_documents = label_counts.sum()
+    ## - observed counts of the (label, present / absent) cells, shape (2, n_labels, n_features)
+    observed = np.stack([present, label_counts[:, None] - present])
+    word_totals = observed.sum(axis=1, keepdims=True)
+    expected = word_totals * label_counts[None, :, None] / n_documents
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if score == "chi2":
+            cells = np.where(expected > 0, (observed - expected) ** 2 / expected, 0.0)
+        elif score == "mutual_info":
+            cells = np.where(observed > 0, observed / n_documents * np.log2(observed / expected), 0.0)
+        else:
+            raise ValueError("score must be one of %s, got %r" % (", ".join(SCORES), score))
+    return cells.sum(axis=(0, 1))
+
+
+def select_features(matrix, vocabulary, min_df=1, max_features=None, score=None):
+    '''chooses the words to keep, using the training split only (a FeatureMatrix or LazyFeatureMatrix)
+
+    Words found in fewer than `min_df` messages are dropped first. Of the rest,
+    at most `max_features` are kept: the most frequent ones, or the best scoring
+    ones when `score` is "chi2" or "mutual_info". Returns (vocabulary, id_map)
+    where id_map[old id] is the new id of the word, or -1 if it was dropped.
+    Kept words keep their relative order.
+    '''
+    n_features = len(vocabulary)
+    document_frequency = np.zeros(n_features, dtype=np.int64)
+    for block in matrix_blocks(matrix):
+        document_frequency += np.bincount(block.indices, minlength=n_features)
+    keep = document_frequency >= min_df
+
+    if max_features is not None and keep.sum() > max_features:
+        if score is None:
+            ranking = document_frequency.astype(np.float64)
+        else:
+            ranking = feature_scores(matrix, n_features, score)
+        ranking = np.where(keep, ranking, -np.inf)
+        ## - stable sort keeps the earlier word on ties
+        best = np.argsort(-ranking, kind="stable")[:max_features]
+        keep = np.zeros(n_features, dtype=bool)
+        keep[best] = True
+
+    id_map = np.full(n_features, -1, dtype=np.int32)
+    kept = np.flatnonzero(keep)
+    id_map[kept] = np.arange(len(kept), dtype=np.int32)
+    words = vocabulary.words
+    return Vocabulary(words[i] for i in kept), id_map
+
+
+def remap_matrix(matrix, id_map):
+    '''returns the FeatureMatrix restricted to the kept words, with their new ids
+
+    A LazyFeatureMatrix gives a LazyFeatureMatrix remapping each chunk as it is encoded.
+    '''
+    if not isinstance(matrix, FeatureMatrix):
+        return LazyFeatureMatrix(matrix.documents, matrix.labels, partial(_remapped, matrix.encode, id_map),
+                                 matrix.chunk_size)
+    new_ids = id_map[matrix.indices]
+    kept = new_ids >= 0
+    ## - the kept entries before each row offset are the new row offsets
+    kept_before = np.zeros(len(kept) + 1, dtype=np.int64)
+    np.cumsum(kept, out=kept_before[1:])
+    return FeatureMatrix(kept_before[matrix.indptr], new_ids[kept], matrix.labels)
+
+
+def _remapped(encode, id_map, document):
+    'encodes the document, then keeps the new ids of its kept words'
+    new_ids = id_map[np.asarray(encode(document), dtype=np.intp)]
+    return new_ids[new_ids >= 0]
@@ -0,0 +1,253 @@
+## Integer indexed vocabulary and sparse feature encoding
+
+from array import array
+from itertools import chain
+
+import numpy as np
+
+
+class Vocabulary(object):
+    '''maps every feature word to a stable integer id
+
+    Ids are handed out in first-seen order, which is the same order as
+    `nltk.FreqDist(all_words).keys()`, which the training script used to build its word features.
+    '''
+
+    def __init__(self, words=()):
+        self.words = list(words)
+        self.index = dict(zip(self.words, range(len(self.words))))
+        if len(self.index) != len(self.words):
+            ## - duplicated words keep the id of their first occurrence
+            words, self.words, self.index = self.words, [], {}
+            for word in words:
+                self.add(word)
+
+    @classmethod
+    def from_documents(cls, documents):
+        'builds the vocabulary of a list of token lists'
+        vocabulary = cls()
+        index = vocabulary.index
+        words = vocabulary.words
+        for document in documents:
+            for word in document:
+                if word not in index:
+                    index[word] = len(words)
+                    words.append(word)
+        return vocabulary
+
+    def add(self, word):
+        'returns the id of the word, adding it to the vocabulary if it is new'
+        word_id = self.index.get(word)
+        if word_id is None:
+            word_id = self.index[word] = len(self.words)
+            self.words.append(word)
+        return word_id
+
+    def get(self, word, default=None):
+        return self.index.get(word, default)
+
+    def feature_names(self):
+        'returns the nltk feature name of every id, `contains(word)`'
+        return ['contains(%s)' % word for word in self.words]
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.index
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __getitem__(self, word_id):
+        return self.words[word_id]
+
+
+class FeatureEncoder(object):
+    '''turns a token list into the sorted ids of the vocabulary words it contains
+
+    The encoded message costs memory and time proportional to its length, not
+    to the vocabulary size. `featureset` expands the ids back into the
+    `{'contains(word)': bool}` dict nltk classifiers expect, reusing feature
+    names formatted once, and formatted again when the vocabulary has grown,
+    e.g. through `VectorizedNaiveBayes.partial_fit`.
+    '''
+
+    def __init__(self, vocabulary):
+        self.vocabulary = vocabulary
+        self._index = vocabulary.index
+        self._names = []
+        self._absent = {}
+        self._feature_names()
+
+    def _feature_names(self):
+        'returns the feature name of every id, rebuilt when the vocabulary has grown'
+        if len(self._names) != len(self.vocabulary):
+            self._names = self.vocabulary.feature_names()
+            self._absent = dict.fromkeys(self._names, False)
+        return self._names
+
+    def encode(self, document):
+        'returns an array of the sorted, unique ids of the known words in the document'
+        index = self._index
+        return array('i', sorted({index[word] for word in document if word in index}))
+
+    def encode_many(self, documents):
+        return [self.encode(document) for document in documents]
+
+    def encode_terms(self, document):
+        'returns an array of the sorted ids of the known words in the document, one per occurrence'
+        index = self._index
+        return array('i', sorted([index[word] for word in document if word in index]))
+
+    def featureset(self, ids):
+        'expands encoded ids into the nltk `contains(word)` feature dict'
+        names = self._feature_names()
+        features = self._absent.copy()
+        for word_id in ids:
+            features[names[word_id]] = True
+        return features
+
+    def extract_features(self, document):
+        'drop-in replacement for the dict based `extract_features` the training script used to define'
+        return self.featureset(self.encode(document))
+
+
+class FeatureMatrix(object):
+    '''CSR-style store of encoded messages: `indices[indptr[i]:indptr[i + 1]]` are the ids of message i
+
+    Each split is encoded once into two flat arrays and then reused for
+    training, evaluation and inspection, instead of nltk's `LazyMap` re-running
+    `extract_features` on every access. Iterating yields (ids, label) pairs
+    whose ids are views into `indices`, so it can be passed wherever a list of
+    encoded (ids, label) pairs is accepted.
+    '''
+
+    def __init__(self, indptr, indices, labels):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.labels = list(labels)
+        if len(self.indptr) != len(self.labels) + 1:
+            raise ValueError("indptr must hold one offset more than there are labels")
+
+    @classmethod
+    def from_encoded(cls, encoded_documents, labels):
+        'builds the matrix from encoded id sequences and their labels'
+        lengths = np.fromiter((len(ids) for ids in encoded_documents), dtype=np.int64, count=len(encoded_documents))
+        indptr = np.zeros(len(encoded_documents) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.fromiter(chain.from_iterable(encoded_documents), dtype=np.int32, count=int(indptr[-1]))
+        return cls(indptr, indices, labels)
+
+    @classmethod
+    def from_labeled(cls, labeled_ids):
+        'builds the matrix from (ids, label) pairs'
+        return cls.from_encoded([ids for (ids, label) in labeled_ids], [label for (ids, label) in labeled_ids])
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes
+
+    def rows(self):
+        'returns the row number of every entry of `indices`'
+        return np.repeat(np.arange(len(self.labels)), np.diff(self.indptr))
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __iter__(self):
+        indptr, indices = self.indptr, self.indices
+        for row, label in enumerate(self.labels):
+            yield indices[indptr[row]:indptr[row + 1]], label
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self.labels))
+            if step != 1:
+                return FeatureMatrix.from_labeled(list(self)[key])
+            indptr = self.indptr[start:stop + 1] if stop > start else self.indptr[start:start + 1]
+            return FeatureMatrix(indptr - indptr[0], self.indices[indptr[0]:indptr[-1]], self.labels[start:stop])
+        if key < 0:
+            key += len(self.labels)
+        return self.indices[self.indptr[key]:self.indptr[key + 1]], self.labels[key]
+
+    def iter_blocks(self, block_size):
+        'yields consecutive FeatureMatrix views of at most block_size messages'
+        for start in range(0, len(self.labels), block_size):
+            yield self[start:start + block_size]
+
+    def decoded(self, vocabulary):
+        'returns the (words, label) pairs, for inspection'
+        words = vocabulary.words
+        return [([words[i] for i in ids], label) for (ids, label) in self]
+
+    def __repr__(self):
+        return "<FeatureMatrix %d messages, %d entries, %d bytes>" % (len(self), len(self.indices), self.nbytes)
+
+
+class LazyFeatureMatrix(object):
+    '''encodes the documents chunk by chunk whenever they are read
+
+    Used by `build_feature_store` when the materialized matrix would not fit the
+    memory budget. It offers the same `__len__`, `__iter__`, `__getitem__` and
+    `iter_blocks` as FeatureMatrix, but pays the encoding cost on every pass.
+    '''
+
+    def __init__(self, documents, labels, encode, chunk_size=1000):
+        self.documents = documents
+        self.labels = list(labels)
+        self.encode = encode
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return len(self.labels)
+
+    def iter_blocks(self, block_size=None):
+        block_size = block_size or self.chunk_size
+        encode = self.encode
+        for start in range(0, len(self.labels), block_size):
+            documents = self.documents[start:start + block_size]
+            yield FeatureMatrix.from_encoded([encode(document) for document in documents],
+                                             self.labels[start:start + block_size])
+
+    def __iter__(self):
+        for block in self.iter_blocks():
+            for item in block:
+                yield item
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return FeatureMatrix.from_encoded([self.encode(document) for document in self.documents[key]],
+                                              self.labels[key])
+        return self.encode(self.documents[key]), self.labels[key]
+
+    def __repr__(self):
+        return "<LazyFeatureMatrix %d messages, chunks of %d>" % (len(self), self.chunk_size)
+
+
+def matrix_blocks(matrix):
+    'yields a FeatureMatrix whole, or a LazyFeatureMatrix (anything with `iter_blocks`) one encoded chunk at a time'
+    if isinstance(matrix, FeatureMatrix):
+        yield matrix
+    else:
+        for block in matrix.iter_blocks():
+            yield block
+
+
+def estimated_nbytes(documents):
+    'upper bound of the FeatureMatrix size of the documents, without encoding them'
+    return 8 * (len(documents) + 1) + 4 * sum(len(document) for document in documents)
+
+
+def build_feature_store(documents, labels, encode, memory_budget=None, chunk_size=1000):
+    '''encodes a split once into a FeatureMatrix
+
+    `documents` are token lists (or raw messages) and `encode` turns one into
+    ids, e.g. `Featurizer.encode_tokens` (or `Featurizer.featurize`). When
+    `memory_budget` (bytes) is given and the matrix could exceed it, a
+    LazyFeatureMatrix encoding `chunk_size` documents at a time is returned instead.
+    '''
+    documents = list(documents)
+    if memory_budget is not None and estimated_nbytes(documents) > memory_budget:
+        return LazyFeatureMatrix(documents, labels, encode, chunk_size)
+    return FeatureMatrix.from_encoded([encode(document) for document in documents], labels)
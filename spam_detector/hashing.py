@@ -0,0 +1,122 @@
+## Hashing-trick features : tokens are hashed into a fixed number of buckets
+
+from array import array
+from time import perf_counter
+from zlib import crc32
+
+import numpy as np
+
+from spam_detector import instrumentation
+from spam_detector.naive_bayes import VectorizedNaiveBayes
+from spam_detector.preprocessing import Preprocessor
+
+DEFAULT_BUCKETS = 1 << 18
+
+
+class BucketVocabulary(object):
+    '''stands in for Vocabulary when feature ids are hash buckets
+
+    It stores no words, so its memory does not grow with the corpus. Bucket
+    names (`#17`) are only generated when asked for, e.g. for
+    `show_most_informative_features`.
+    '''
+
+    def __init__(self, n_buckets=DEFAULT_BUCKETS, max_ngram=1):
+        if n_buckets <= 0:
+            raise ValueError("n_buckets must be positive, got %r" % (n_buckets,))
+        self.n_buckets = n_buckets
+        self.max_ngram = max_ngram
+
+    def __len__(self):
+        return self.n_buckets
+
+    def __eq__(self, other):
+        return (isinstance(other, BucketVocabulary) and
+                (self.n_buckets, self.max_ngram) == (other.n_buckets, other.max_ngram))
+
+    def __ne__(self, other):
+        return not self == other
+
+    @property
+    def words(self):
+        return ['#%d' % bucket for bucket in range(self.n_buckets)]
+
+    def feature_names(self):
+        return ['contains(#%d)' % bucket for bucket in range(self.n_buckets)]
+
+
+class HashingFeaturizer(object):
+    '''raw message -> sorted, unique bucket ids of its normalized tokens (and n-grams)
+
+    Uses the same `Preprocessor` as `Featurizer`, then hashes every token, and
+    every run of up to `max_ngram` consecutive tokens, with crc32 into
+    `n_buckets` buckets. The hash is stable across processes and machines, so
+    models trained on different shards share one feature space and can be
+    merged by adding their counts. Words never seen in training still land in
+    a bucket instead of being dropped.
+    '''
+
+    def __init__(self, n_buckets=DEFAULT_BUCKETS, max_ngram=1, preprocessor=None):
+        if max_ngram < 1:
+            raise ValueError("max_ngram must be at least 1, got %r" % (max_ngram,))
+        self.vocabulary = BucketVocabulary(n_buckets, max_ngram)
+        self.n_buckets = n_buckets
+        self.max_ngram = max_ngram
+        self.preprocessor = preprocessor if preprocessor is not None else Preprocessor()
+
+    @classmethod
+    def from_vocabulary(cls, vocabulary, preprocessor=None):
+        return cls(vocabulary.n_buckets, vocabulary.max_ngram, preprocessor)
+
+    def tokens(self, raw_text):
+        return self.preprocessor.tokens(raw_text)
+
+    def encode_tokens(self, tokens):
+        'returns an array of the sorted, unique buckets of the tokens and their n-grams'
+        n_buckets = self.n_buckets
+        buckets = set(crc32(token.encode("utf-8")) % n_buckets for token in tokens)
+        for n in range(2, self.max_ngram + 1):
+            for start in range(len(tokens) - n + 1):
+                buckets.add(crc32(" ".join(tokens[start:start + n]).encode("utf-8")) % n_buckets)
+        return array('i', sorted(buckets))
+
+    def featurize(self, raw_text):
+        tokens = self.preprocessor.tokens(raw_text)
+        if not instrumentation.ENABLED:
+            return self.encode_tokens(tokens)
+        start = perf_counter()
+        buckets = self.encode_tokens(tokens)
+        instrumentation.record("extract_features", perf_counter() - start, len(tokens))
+        return buckets
+
+    def featurize_many(self, raw_texts):
+        return [self.featurize(raw_text) for raw_text in raw_texts]
+
+    __call__ = featurize
+
+
+def merge_hashed(classifiers):
+    '''merges hashed classifiers trained on different shards into one, by adding their counts
+
+    All classifiers must share the same bucket space and still hold their counts.
+    The result equals a classifier trained on the union of the shards.
+    '''
+    classifiers = list(classifiers)
+    if not classifiers:
+        raise ValueError("nothing to merge")
+    vocabulary = classifiers[0].vocabulary
+    labels = []
+    for classifier in classifiers:
+        if not isinstance(classifier.vocabulary, BucketVocabulary) or classifier.vocabulary != vocabulary:
+            raise ValueError("only classifiers over the same hash buckets can be merged")
+        if classifier.feature_counts is None:
+            raise ValueError("classifiers without counts cannot be merged")
+        labels.extend(label for label in classifier.labels() if label not in labels)
+
+    feature_counts = np.zeros((len(labels), len(vocabulary)))
+    label_counts = np.zeros(len(labels))
+    for classifier in classifiers:
+        rows = [labels.index(label) for label in classifier.labels()]
+        feature_counts[rows] += classifier.feature_counts
+        label_counts[rows] += classifier.label_counts
+    return VectorizedNaiveBayes.from_counts(labels, vocabulary, feature_counts, label_counts)
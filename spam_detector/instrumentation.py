@@ -0,0 +1,167 @@
+## Optional instrumentation of the pipeline : stage timers, call counters, cache hit ratios
+##
+## Off by default. The hot paths only read the module flag `ENABLED` once per call,
+## and take their timed branch when it is set :
+##
+##   from spam_detector import instrumentation
+##   instrumentation.enable()
+##   ... train / score ...
+##   print(instrumentation.to_json())
+##
+## `profile(path)` additionally runs cProfile over a block and dumps a pstats file.
+
+import cProfile
+import json
+import time
+import weakref
+from contextlib import contextmanager
+
+## - read directly by the instrumented code, change it through enable() / disable()
+ENABLED = False
+
+
+class StageStats(object):
+    'call count, total / min / max time and a log2 histogram of the calls of one stage'
+
+    def __init__(self):
+        self.calls = 0
+        self.items = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        ## - bucket b counts the calls that took less than 2 ** b microseconds
+        self.histogram = {}
+
+    def add(self, seconds, items=1):
+        self.calls += 1
+        self.items += items
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        bucket = int(seconds * 1e6).bit_length()
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def snapshot(self):
+        return {
+            "calls": self.calls,
+            "items": self.items,
+            "total_ms": 1e3 * self.total,
+            "mean_us": 1e6 * self.total / self.calls if self.calls else 0.0,
+            "min_us": 1e6 * self.min if self.calls else 0.0,
+            "max_us": 1e6 * self.max,
+            "histogram_us": dict(("<%d" % (1 << bucket), count) for bucket, count in sorted(self.histogram.items())),
+        }
+
+
+class Instrumentation(object):
+    'the registry the pipeline reports to'
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.caches = weakref.WeakSet()
+        self.started = time.time()
+
+    def record(self, stage, seconds, items=1):
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = StageStats()
+        stats.add(seconds, items)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def watch_cache(self, cache):
+        'adds a NormalizationCache to the hit ratio report, without keeping it alive'
+        self.caches.add(cache)
+
+    def reset(self):
+        self.stages.clear()
+        self.counters.clear()
+        for cache in self.caches:
+            cache.hits = cache.misses = 0
+        self.started = time.time()
+
+    def snapshot(self):
+        'returns the collected figures as a plain, JSON serializable dict'
+        hits = sum(cache.hits for cache in self.caches)
+        misses = sum(cache.misses for cache in self.caches)
+        return {
+            "enabled": ENABLED,
+            "seconds": time.time() - self.started,
+            "stages": dict((stage, stats.snapshot()) for stage, stats in sorted(self.stages.items())),
+            "counters": dict(sorted(self.counters.items())),
+            "normalization_cache": {"instances": len(self.caches), "hits": hits, "misses": misses,
+                                    "hit_ratio": hits / float(hits + misses) if hits + misses else 0.0},
+        }
+
+
+registry = Instrumentation()
+
+
+def enable(reset=True):
+    global ENABLED
+    if reset:
+        registry.reset()
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def record(stage, seconds, items=1):
+    registry.record(stage, seconds, items)
+
+
+def count(name, n=1):
+    registry.count(name, n)
+
+
+def watch_cache(cache):
+    registry.watch_cache(cache)
+
+
+def snapshot():
+    return registry.snapshot()
+
+
+def to_json(indent=2):
+    return json.dumps(snapshot(), indent=indent)
+
+
+@contextmanager
+def stage(name, items=1):
+    'times the block as `name` when instrumentation is enabled'
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start, items)
+
+
+@contextmanager
+def profile(path=None):
+    '''enables instrumentation and cProfile for the block, then dumps the pstats file to `path`
+
+    Yields the profiler, so `pstats.Stats(profiler)` can also be used directly.
+    Instrumentation is restored to its previous state afterwards.
+    '''
+    was_enabled = ENABLED
+    enable(reset=not was_enabled)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if not was_enabled:
+            disable()
+        if path is not None:
+            profiler.dump_stats(path)
@@ -0,0 +1,193 @@
+## Compact, memory-mappable model file format
+##
+## Layout : MAGIC, a little-endian uint32 header length, a JSON header, then the raw
+## arrays, each starting on a 64 byte boundary. The header holds the format version,
+## the labels and the dtype/shape/offset of every array. The vocabulary is stored as
+## one utf-8 blob plus an offsets array, so nothing is unpickled on load. Hashed models
+## store no words, only their bucket space under the "buckets" header key. The
+## "preprocessing" key holds the Preprocessor settings the model was trained with, and
+## "kind" the Naive Bayes variant, which decides the arrays that are stored.
+
+import json
+import os
+import pickle
+import struct
+
+import nltk
+import numpy as np
+
+from spam_detector.features import Vocabulary
+from spam_detector.hashing import BucketVocabulary
+from spam_detector.multinomial import ComplementNaiveBayes, MultinomialNaiveBayes
+from spam_detector.naive_bayes import SparseLinearClassifier, VectorizedNaiveBayes
+
+MAGIC = b"SPAMNB\x00\x01"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+## - the "kind" header key : its classifier and the arrays it is rebuilt from, memory-mapped on load.
+## Subclasses come first, a kind is found with the first isinstance match
+MODEL_KINDS = (
+    ("complement", ComplementNaiveBayes, ("weights",)),
+    ("multinomial", MultinomialNaiveBayes, ("log_prior", "log_likelihood")),
+    ("bernoulli", VectorizedNaiveBayes, ("log_prior", "log_present", "log_absent", "delta", "bias")),
+)
+## - files written before the "kind" key hold Bernoulli models
+DEFAULT_KIND = "bernoulli"
+## - sufficient statistics for `partial_fit`, saved when the classifier has them and read into memory
+COUNT_ARRAYS = ("feature_counts", "label_counts")
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _vocabulary_arrays(vocabulary):
+    encoded = [word.encode("utf-8") for word in vocabulary.words]
+    offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+    np.cumsum([len(word) for word in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _kind(classifier):
+    'returns (kind, array names) of a classifier, TypeError if it cannot be saved'
+    for kind, cls, names in MODEL_KINDS:
+        if isinstance(classifier, cls):
+            return kind, names
+    raise TypeError("cannot save a %s, only %s models" % (type(classifier).__name__,
+                                                           ", ".join(cls.__name__ for _, cls, _ in MODEL_KINDS)))
+
+
+def save_model(classifier, path, preprocessing=None):
+    '''writes a VectorizedNaiveBayes, MultinomialNaiveBayes or ComplementNaiveBayes classifier to `path`
+
+    `preprocessing`, a Preprocessor or its `config()`, is stored in the header
+    (by default the classifier's own `preprocessing`) so that the serving
+    paths rebuild the same tokenizer, stemming and length filter.
+    '''
+    if preprocessing is None:
+        preprocessing = getattr(classifier, "preprocessing", None)
+    if hasattr(preprocessing, "config"):
+        preprocessing = preprocessing.config()
+    kind, model_arrays = _kind(classifier)
+    arrays = dict((name, np.ascontiguousarray(getattr(classifier, name), dtype="<f8")) for name in model_arrays)
+    for name in COUNT_ARRAYS:
+        if getattr(classifier, name, None) is not None:
+            arrays[name] = np.ascontiguousarray(getattr(classifier, name), dtype="<f8")
+    vocabulary = classifier.vocabulary
+    if not isinstance(vocabulary, BucketVocabulary):
+        arrays["vocabulary_offsets"], arrays["vocabulary_blob"] = _vocabulary_arrays(vocabulary)
+
+    ## - the header size depends on the offsets it contains, so lay out the arrays after a fixed reserve
+    def layout(data_start):
+        entries = {}
+        offset = data_start
+        for name, array in arrays.items():
+            offset = _aligned(offset)
+            entries[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset += array.nbytes
+        return entries
+
+    header = {"version": FORMAT_VERSION, "kind": kind, "labels": classifier.labels(), "arrays": None}
+    if preprocessing is not None:
+        header["preprocessing"] = preprocessing
+    if isinstance(vocabulary, BucketVocabulary):
+        ## - hashed features have no words to store, only the bucket space
+        header["buckets"] = {"n_buckets": vocabulary.n_buckets, "max_ngram": vocabulary.max_ngram}
+    data_start = len(MAGIC) + 4
+    while True:
+        header["arrays"] = layout(data_start)
+        header_bytes = json.dumps(header, sort_keys=True).encode("utf-8")
+        needed = _aligned(len(MAGIC) + 4 + len(header_bytes))
+        if needed <= data_start:
+            break
+        data_start = needed
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.write(b"\0" * (header["arrays"][name]["offset"] - f.tell()))
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_header(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not a spam detector model file")
+    (length,) = struct.unpack("<I", f.read(4))
+    header = json.loads(f.read(length).decode("utf-8"))
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError("unsupported model format version %r" % (header.get("version"),))
+    return header
+
+
+def is_model_file(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def load_model(path, mmap=True, **kwargs):
+    '''reads a model written by `save_model`
+
+    With `mmap=True` the probability arrays are memory-mapped read-only, so
+    every process loading the same file shares one copy of the pages.
+    '''
+    with open(path, "rb") as f:
+        header = read_header(f)
+        kinds = dict((kind, (cls, names)) for kind, cls, names in MODEL_KINDS)
+        kind = header.get("kind", DEFAULT_KIND)
+        if kind not in kinds:
+            raise ValueError("unsupported model kind %r" % (kind,))
+        cls, model_arrays = kinds[kind]
+        arrays = {}
+        for name, entry in header["arrays"].items():
+            shape = tuple(entry["shape"])
+            dtype = np.dtype(entry["dtype"])
+            if mmap and name in model_arrays and int(np.prod(shape)):
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=entry["offset"], shape=shape)
+            else:
+                f.seek(entry["offset"])
+                count = int(np.prod(shape))
+                arrays[name] = np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+
+    if "buckets" in header:
+        vocabulary = BucketVocabulary(header["buckets"]["n_buckets"], header["buckets"]["max_ngram"])
+    else:
+        blob = arrays.pop("vocabulary_blob").tobytes()
+        offsets = arrays.pop("vocabulary_offsets").tolist()
+        vocabulary = Vocabulary(blob[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:]))
+    counts = {"feature_counts": arrays.get("feature_counts"), "label_counts": arrays.get("label_counts")}
+    if kind == "bernoulli":
+        classifier = cls(header["labels"], vocabulary, arrays["log_prior"], arrays["log_present"],
+                         arrays["log_absent"], delta=arrays["delta"], bias=arrays["bias"], **dict(counts, **kwargs))
+    else:
+        classifier = cls(header["labels"], vocabulary, *[arrays[name] for name in model_arrays],
+                         **dict(counts, **kwargs))
+    ## - models saved without it are served with the default Preprocessor
+    classifier.preprocessing = header.get("preprocessing")
+    return classifier
+
+
+def from_pickled(classifier):
+    '''returns an unpickled classifier in a form that can be saved and served
+
+    Vectorized models are returned as they are, an `nltk.NaiveBayesClassifier`
+    is converted to VectorizedNaiveBayes, anything else is a TypeError.
+    '''
+    if isinstance(classifier, SparseLinearClassifier):
+        return classifier
+    if isinstance(classifier, nltk.NaiveBayesClassifier):
+        return VectorizedNaiveBayes.from_nltk(classifier)
+    raise TypeError("expected a pickled nltk.NaiveBayesClassifier or Naive Bayes model of this package, got a %s"
+                    % type(classifier).__name__)
+
+
+def convert_pickle(pickle_path, path):
+    'converts a pickled nltk.NaiveBayesClassifier or model of this package (only convert trusted files)'
+    with open(pickle_path, "rb") as f:
+        classifier = from_pickled(pickle.load(f))
+    save_model(classifier, path)
+    return classifier
+
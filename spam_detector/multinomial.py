@@ -0,0 +1,94 @@
+## Multinomial and complement Naive Bayes over term counts
+
+import numpy as np
+
+from spam_detector.features import FeatureMatrix
+from spam_detector.naive_bayes import SparseLinearClassifier, count_matrix
+
+
+class MultinomialNaiveBayes(SparseLinearClassifier):
+    '''Naive Bayes over how often each word occurs in a message
+
+    Messages are encoded with one id per occurrence (`Featurizer(counts=True)`,
+    `FeatureEncoder.encode_terms`), so "free free free" weighs three times
+    "free". Word probabilities use additive (Laplace / Lidstone) smoothing
+    `alpha`. Absent words contribute nothing, so scoring only touches the
+    words of the message.
+    '''
+
+    term_counts = True
+
+    def __init__(self, labels, vocabulary, log_prior, log_likelihood, batch_size=512, feature_counts=None,
+                 label_counts=None):
+        self._labels = list(labels)
+        self.vocabulary = vocabulary
+        self.log_prior = np.asarray(log_prior, dtype=np.float64)
+        self.log_likelihood = np.asarray(log_likelihood, dtype=np.float64)
+        self.feature_counts = feature_counts
+        self.label_counts = label_counts
+        self.batch_size = batch_size
+        self._feature_index = None
+        self.bias = self.log_prior
+        self.delta = self.log_likelihood
+
+    @classmethod
+    def train_matrix(cls, matrix, vocabulary, alpha=1.0, **kwargs):
+        'trains on a FeatureMatrix or LazyFeatureMatrix of term ids, one entry per occurrence'
+        labels, term_counts, label_counts = count_matrix(matrix, len(vocabulary))
+        return cls.from_counts(labels, vocabulary, term_counts, label_counts, alpha=alpha, **kwargs)
+
+    @classmethod
+    def train_encoded(cls, labeled_ids, vocabulary, alpha=1.0, **kwargs):
+        'trains on (term ids, label) pairs'
+        if not hasattr(labeled_ids, "iter_blocks"):
+            labeled_ids = FeatureMatrix.from_labeled(list(labeled_ids))
+        return cls.train_matrix(labeled_ids, vocabulary, alpha=alpha, **kwargs)
+
+    @classmethod
+    def from_counts(cls, labels, vocabulary, term_counts, label_counts, alpha=1.0, **kwargs):
+        '''term_counts[c, j] is the number of occurrences of word j in messages of label c
+        and label_counts[c] the number of messages of label c'''
+        term_counts = np.asarray(term_counts, dtype=np.float64)
+        label_counts = np.asarray(label_counts, dtype=np.float64)
+        smoothed = term_counts + alpha
+        log_likelihood = np.log2(smoothed / smoothed.sum(axis=1, keepdims=True))
+        log_prior = np.log2(label_counts / label_counts.sum())
+        return cls(labels, vocabulary, log_prior, log_likelihood, feature_counts=term_counts,
+                   label_counts=label_counts, **kwargs)
+
+    def _ids(self, features):
+        'returns the term ids of a {feature name: count} dict or an id sequence'
+        if isinstance(features, dict):
+            if self._feature_index is None:
+                self._feature_index = dict(zip(self.vocabulary.feature_names(), range(len(self.vocabulary))))
+            index = self._feature_index
+            return [index[fname] for fname, count in features.items() if fname in index
+                    for _ in range(int(count))]
+        return features
+
+
+class ComplementNaiveBayes(MultinomialNaiveBayes):
+    '''complement Naive Bayes (Rennie et al. 2003) for unbalanced labels
+
+    Each label is described by the word counts of all the *other* labels,
+    which have many more messages than the minority label, so its estimates
+    are less skewed by the 747 spam / 4827 ham imbalance. A message goes to the
+    label whose complement fits it worst. With `norm` the weights of every
+    label are scaled to unit L1 norm. As in the paper, priors are not used.
+    '''
+
+    def __init__(self, labels, vocabulary, weights, batch_size=512, feature_counts=None, label_counts=None):
+        weights = np.asarray(weights, dtype=np.float64)
+        MultinomialNaiveBayes.__init__(self, labels, vocabulary, np.zeros(len(labels)), -weights, batch_size,
+                                       feature_counts, label_counts)
+        self.weights = weights
+
+    @classmethod
+    def from_counts(cls, labels, vocabulary, term_counts, label_counts, alpha=1.0, norm=False, **kwargs):
+        term_counts = np.asarray(term_counts, dtype=np.float64)
+        label_counts = np.asarray(label_counts, dtype=np.float64)
+        complement = term_counts.sum(axis=0) - term_counts + alpha
+        weights = np.log2(complement / complement.sum(axis=1, keepdims=True))
+        if norm:
+            weights /= np.abs(weights).sum(axis=1, keepdims=True)
+        return cls(labels, vocabulary, weights, feature_counts=term_counts, label_counts=label_counts, **kwargs)
@@ -0,0 +1,387 @@
+## Naive Bayes classifier over dense NumPy log-probability matrices
+
+from time import perf_counter
+
+import numpy as np
+from nltk.probability import DictionaryProbDist
+
+from spam_detector import instrumentation
+from spam_detector.features import FeatureMatrix, LazyFeatureMatrix, Vocabulary, matrix_blocks
+
+FEATURE_PREFIX = "contains("
+## - arrays VectorizedNaiveBayes derives from its counts, dropped by partial_fit until they are next read
+DERIVED_ARRAYS = ("log_prior", "log_present", "log_absent", "delta", "bias")
+
+
+def ele_log_probabilities(feature_counts, label_counts):
+    '''returns (log_prior, log_present, log_absent) of per-label word counts, as nltk's ELEProbDist computes them
+
+    ELEProbDist : (count + 0.5) / (N + 0.5 * bins), where bins is the number of
+    values (True / False) seen for the feature anywhere in the training data.
+    '''
+    n_documents = label_counts.sum()
+    document_frequency = feature_counts.sum(axis=0)
+    bins = (document_frequency > 0).astype(np.float64) + (document_frequency < n_documents)
+    denominator = label_counts[:, None] + 0.5 * bins
+    log_present = np.log2((feature_counts + 0.5) / denominator)
+    log_absent = np.log2((label_counts[:, None] - feature_counts + 0.5) / denominator)
+    log_prior = np.log2((label_counts + 0.5) / (n_documents + 0.5 * len(label_counts)))
+    return log_prior, log_present, log_absent
+
+
+def count_matrix(matrix, n_features):
+    '''returns (labels, feature_counts, label_counts) of a FeatureMatrix as int64 arrays
+
+    Labels are numbered in first-seen order; feature_counts[c, j] is the number
+    of messages of label c containing feature j. A LazyFeatureMatrix is counted
+    one encoded chunk at a time, so it is never materialized whole.
+    '''
+    label_names = []
+    label_index = {}
+    for label in matrix.labels:
+        if label not in label_index:
+            label_index[label] = len(label_names)
+            label_names.append(label)
+    y = np.fromiter((label_index[label] for label in matrix.labels), dtype=np.intp, count=len(matrix))
+
+    n_labels = len(label_names)
+    counts = np.zeros(n_labels * n_features, dtype=np.int64)
+    start = 0
+    for block in matrix_blocks(matrix):
+        block_y = y[start:start + len(block)]
+        counts += np.bincount(block_y[block.rows()] * n_features + block.indices, minlength=n_labels * n_features)
+        start += len(block)
+    label_counts = np.bincount(y, minlength=n_labels)
+    return label_names, counts.reshape(n_labels, n_features), label_counts.astype(np.int64)
+
+
+def feature_word(fname):
+    'returns the word of a `contains(word)` feature name'
+    if not (fname.startswith(FEATURE_PREFIX) and fname.endswith(")")):
+        raise ValueError("only `contains(word)` features are supported, got %r" % (fname,))
+    return fname[len(FEATURE_PREFIX):-1]
+
+
+class SparseLinearClassifier(object):
+    '''scores a message as `bias` plus the `delta` columns of the feature ids it contains
+
+    Shared by the Naive Bayes variants: subclasses set `_labels`, `vocabulary`,
+    `delta` (n_labels, n_features), `bias` (n_labels), `batch_size` and
+    `_feature_index`. A batch is scored with one gather over the ids present in
+    its messages, so the cost depends on the message lengths, not on the
+    vocabulary size. `classify` and `prob_classify` score one message directly
+    from the `delta` columns of its words. Scores are log2 probabilities up to a
+    per-message constant.
+    '''
+
+    ## - True when messages are encoded with one id per occurrence (`Featurizer(counts=True)`)
+    term_counts = False
+    ## - `preprocessing_config` of the training data, saved with the model so it is served the same way
+    preprocessing = None
+
+    def labels(self):
+        return list(self._labels)
+
+    def __len__(self):
+        return len(self.vocabulary)
+
+    def _ids(self, features):
+        'returns the ids of the present features of a featureset dict or an id sequence'
+        if isinstance(features, dict):
+            if self._feature_index is None:
+                self._feature_index = dict(zip(self.vocabulary.feature_names(), range(len(self.vocabulary))))
+            index = self._feature_index
+            return [index[fname] for fname, value in features.items() if value and fname in index]
+        return features
+
+    def log_scores_many(self, featuresets):
+        '''returns the `(n_messages, n_labels)` array of unnormalized log2 scores
+
+        `featuresets` is a list of featureset dicts or id sequences, a
+        FeatureMatrix or a LazyFeatureMatrix.
+        '''
+        started = perf_counter() if instrumentation.ENABLED else None
+        if isinstance(featuresets, FeatureMatrix):
+            blocks = featuresets.iter_blocks(self.batch_size)
+        elif isinstance(featuresets, LazyFeatureMatrix):
+            blocks = featuresets.iter_blocks()
+        else:
+            encoded = [self._ids(features) for features in featuresets]
+            blocks = FeatureMatrix.from_encoded(encoded, [None] * len(encoded)).iter_blocks(self.batch_size)
+
+        scores = []
+        for block in blocks:
+            ## - only the words present in a message are touched, everything else is already in `bias`
+            rows = block.rows()
+            contributions = self.delta[:, block.indices]
+            block_scores = np.empty((len(block), len(self._labels)))
+            for column, label_contributions in enumerate(contributions):
+                block_scores[:, column] = np.bincount(rows, weights=label_contributions, minlength=len(block))
+            scores.append(block_scores + self.bias)
+        scores = np.concatenate(scores) if scores else np.empty((0, len(self._labels)))
+        if started is not None:
+            instrumentation.record("classify", perf_counter() - started, len(scores))
+        return scores
+
+    def log_scores(self, features):
+        '''returns the `(n_labels,)` unnormalized log2 scores of one message
+
+        The fast path of classify / prob_classify : one gather of the `delta`
+        columns of the words the message contains, without building a
+        FeatureMatrix or copying `delta`, which may be memory-mapped and shared.
+        '''
+        started = perf_counter() if instrumentation.ENABLED else None
+        ids = self._ids(features)
+        if len(ids):
+            scores = self.bias + self.delta.take(np.asarray(ids, dtype=np.intp), axis=1).sum(axis=1)
+        else:
+            scores = self.bias.copy()
+        if started is not None:
+            instrumentation.record("classify", perf_counter() - started)
+        return scores
+
+    def classify_many(self, featuresets):
+        scores = self.log_scores_many(featuresets)
+        labels = self._labels
+        return [labels[i] for i in scores.argmax(axis=1)]
+
+    def classify(self, features):
+        return self._labels[int(self.log_scores(features).argmax())]
+
+    def prob_classify_many(self, featuresets):
+        scores = self.log_scores_many(featuresets)
+        return [DictionaryProbDist(dict(zip(self._labels, row)), log=True, normalize=True)
+                for row in scores.tolist()]
+
+    def prob_classify(self, features):
+        return DictionaryProbDist(dict(zip(self._labels, self.log_scores(features).tolist())), log=True,
+                                  normalize=True)
+
+    def probabilities_many(self, featuresets):
+        'returns the `(n_messages, n_labels)` array of normalized label probabilities'
+        scores = self.log_scores_many(featuresets)
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp2(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return probabilities
+
+
+class VectorizedNaiveBayes(SparseLinearClassifier):
+    '''Bernoulli Naive Bayes over boolean `contains(word)` features
+
+    Gives the same labels as `nltk.NaiveBayesClassifier` trained on the same
+    featuresets: priors and feature probabilities use the same expected
+    likelihood estimate (ELEProbDist) and log base 2. The probabilities are
+    stored as `(n_labels, n_features)` arrays and a batch of messages is scored
+    with vectorized gathers over the words it contains, instead of a dict
+    lookup per feature and label.
+
+    `classify`, `classify_many`, `prob_classify` and `prob_classify_many` take
+    either nltk featureset dicts or encoded id arrays from `FeatureEncoder`.
+    Words missing from a message count as absent, so featureset dicts are
+    expected to hold every vocabulary feature, as `FeatureEncoder.featureset` builds them.
+
+    Classifiers trained here keep their sufficient statistics, the per-label
+    message counts and word presence counts, so `partial_fit` can add new
+    labeled messages without retraining from scratch.
+    '''
+
+    def __init__(self, labels, vocabulary, log_prior, log_present, log_absent, batch_size=512, delta=None,
+                 bias=None, feature_counts=None, label_counts=None):
+        self._labels = list(labels)
+        self.feature_counts = None if feature_counts is None else np.asarray(feature_counts, dtype=np.float64)
+        self.label_counts = None if label_counts is None else np.asarray(label_counts, dtype=np.float64)
+        self.vocabulary = vocabulary
+        self.log_prior = np.asarray(log_prior, dtype=np.float64)
+        self.log_present = np.asarray(log_present, dtype=np.float64)
+        self.log_absent = np.asarray(log_absent, dtype=np.float64)
+        self.batch_size = batch_size
+        self._feature_index = None
+        if delta is None or bias is None:
+            self._prepare()
+        else:
+            ## - precomputed scoring arrays, e.g. memory-mapped from a saved model
+            self.delta = np.asarray(delta, dtype=np.float64)
+            self.bias = np.asarray(bias, dtype=np.float64)
+
+    def _prepare(self):
+        ## - log P(x|c) = sum(absent) + sum over present words of (present - absent)
+        self.delta = self.log_present - self.log_absent
+        self.bias = self.log_prior + self.log_absent.sum(axis=1)
+
+    @classmethod
+    def train_encoded(cls, labeled_ids, vocabulary, **kwargs):
+        'trains on (encoded ids, label) pairs over `vocabulary`, or on a FeatureMatrix or LazyFeatureMatrix'
+        if not hasattr(labeled_ids, "iter_blocks"):
+            labeled_ids = FeatureMatrix.from_labeled(list(labeled_ids))
+        return cls.train_matrix(labeled_ids, vocabulary, **kwargs)
+
+    @classmethod
+    def train_matrix(cls, matrix, vocabulary, **kwargs):
+        'trains on the messages and labels of a FeatureMatrix, or of a LazyFeatureMatrix chunk by chunk'
+        with instrumentation.stage("train", len(matrix)):
+            label_names, counts, label_counts = count_matrix(matrix, len(vocabulary))
+            return cls.from_counts(label_names, vocabulary, counts.astype(np.float64),
+                                   label_counts.astype(np.float64), **kwargs)
+
+    @classmethod
+    def from_counts(cls, labels, vocabulary, feature_counts, label_counts, **kwargs):
+        '''builds the classifier from its sufficient statistics
+
+        feature_counts[c, j] is the number of messages of label c containing word j
+        and label_counts[c] the number of messages of label c.
+        '''
+        log_prior, log_present, log_absent = ele_log_probabilities(feature_counts, label_counts)
+        return cls(labels, vocabulary, log_prior, log_present, log_absent, feature_counts=feature_counts,
+                   label_counts=label_counts, **kwargs)
+
+    def partial_fit(self, labeled_documents):
+        '''adds (token list, label) pairs, e.g. `Preprocessor` output, to the model
+
+        Unknown words are appended to the vocabulary and unknown labels become
+        new labels. Only the new messages are counted, in time proportional to
+        the batch, and the count arrays grow by doubling their capacity rather
+        than being copied for every new word. Featurizers and encoders sharing
+        this vocabulary see the new words immediately.
+
+        The probabilities are not refreshed here: the ELE estimate of every
+        word depends on the message count of its label, which every update
+        changes, so a refresh is O(labels x vocabulary). It runs once, the
+        next time the model is scored or its arrays are read, however many
+        batches were added since, and gives the same model as training on all
+        messages at once.
+        '''
+        self._check_counts()
+        vocabulary = self.vocabulary
+        if not hasattr(vocabulary, "add"):
+            raise ValueError("the vocabulary of this classifier cannot grow, encode the messages and use "
+                             "partial_fit_matrix instead")
+        encoded = []
+        labels = []
+        for tokens, label in labeled_documents:
+            encoded.append(sorted(set(vocabulary.add(word) for word in tokens)))
+            labels.append(label)
+        return self.partial_fit_matrix(FeatureMatrix.from_encoded(encoded, labels))
+
+    def partial_fit_matrix(self, matrix):
+        'adds the encoded messages of a FeatureMatrix, whose ids must be within the vocabulary'
+        self._check_counts()
+        label_index = dict((label, i) for i, label in enumerate(self._labels))
+        for label in matrix.labels:
+            if label not in label_index:
+                label_index[label] = len(self._labels)
+                self._labels.append(label)
+
+        n_labels, n_features = len(self._labels), len(self.vocabulary)
+        if (n_labels, n_features) != self.feature_counts.shape or not self.feature_counts.flags.writeable:
+            self._grow_counts(n_labels, n_features)
+
+        y = np.fromiter((label_index[label] for label in matrix.labels), dtype=np.intp, count=len(matrix))
+        np.add.at(self.feature_counts, (y[matrix.rows()], matrix.indices), 1)
+        self.label_counts += np.bincount(y, minlength=n_labels)
+        self._feature_index = None
+        for name in DERIVED_ARRAYS:
+            self.__dict__.pop(name, None)
+        self._stale = True
+        return self
+
+    def __getattr__(self, name):
+        ## - only called for missing attributes : the arrays partial_fit dropped are recomputed on first use
+        if name in DERIVED_ARRAYS and self.__dict__.get("_stale"):
+            self._refresh()
+            return self.__dict__[name]
+        raise AttributeError("%r object has no attribute %r" % (type(self).__name__, name))
+
+    def _grow_counts(self, n_labels, n_features):
+        '''makes the count arrays (n_labels, n_features) and writeable
+
+        `feature_counts` is a view of the first columns of a larger zeroed
+        buffer, whose capacity doubles when the vocabulary outgrows it.
+        '''
+        buffer = getattr(self, "_count_buffer", None)
+        old_labels, old_features = self.feature_counts.shape
+        if (buffer is None or self.feature_counts.base is not buffer or buffer.shape[0] != n_labels or
+                buffer.shape[1] < n_features):
+            buffer = np.zeros((n_labels, max(n_features, 2 * old_features)))
+            buffer[:old_labels, :old_features] = self.feature_counts
+            self._count_buffer = buffer
+        label_counts = np.zeros(n_labels)
+        label_counts[:old_labels] = self.label_counts
+        self.feature_counts, self.label_counts = buffer[:, :n_features], label_counts
+
+    def _check_counts(self):
+        if self.feature_counts is None or self.label_counts is None:
+            raise ValueError("this classifier has no word counts (converted or loaded without them), "
+                             "it cannot be updated incrementally")
+
+    def _refresh(self):
+        'recomputes the probabilities from the counts'
+        self.log_prior, self.log_present, self.log_absent = ele_log_probabilities(self.feature_counts,
+                                                                                  self.label_counts)
+        self._prepare()
+        self._stale = False
+
+    @classmethod
+    def train(cls, labeled_featuresets, **kwargs):
+        '''trains on the same (featureset, label) pairs as `nltk.NaiveBayesClassifier.train`
+
+        Every featureset must hold a boolean value for every feature, as the
+        dicts built by `FeatureEncoder.featureset` do.
+        '''
+        vocabulary = Vocabulary()
+        labeled_ids = []
+        for featureset, label in labeled_featuresets:
+            if not labeled_ids:
+                ## - the first featureset lists every feature, keep its order for the vocabulary
+                for fname in featureset:
+                    vocabulary.add(feature_word(fname))
+            ids = [vocabulary.add(feature_word(fname)) for fname, value in featureset.items() if value]
+            labeled_ids.append((ids, label))
+        return cls.train_encoded(labeled_ids, vocabulary, **kwargs)
+
+    @classmethod
+    def from_nltk(cls, classifier, **kwargs):
+        'converts a trained `nltk.NaiveBayesClassifier`, e.g. the pickled model'
+        labels = classifier.labels()
+        label_probdist = classifier._label_probdist
+        feature_probdist = classifier._feature_probdist
+
+        vocabulary = Vocabulary()
+        for label, fname in feature_probdist:
+            vocabulary.add(feature_word(fname))
+
+        log_present = np.zeros((len(labels), len(vocabulary)))
+        log_absent = np.zeros((len(labels), len(vocabulary)))
+        label_index = dict((label, i) for i, label in enumerate(labels))
+        for (label, fname), probdist in feature_probdist.items():
+            row = label_index[label]
+            column = vocabulary.index[feature_word(fname)]
+            log_present[row, column] = probdist.logprob(True)
+            log_absent[row, column] = probdist.logprob(False)
+        log_prior = [label_probdist.logprob(label) for label in labels]
+        return cls(labels, vocabulary, log_prior, log_present, log_absent, **kwargs)
+
+    def _most_informative_columns(self, n):
+        'returns (column, value) pairs ordered by the ratio of the largest to the smallest label probability'
+        n_features = len(self.vocabulary)
+        present = np.exp2(self.log_present)
+        absent = np.exp2(self.log_absent)
+        ratios = np.concatenate([present.max(0) / present.min(0), absent.max(0) / absent.min(0)])
+        order = np.argsort(-ratios, kind="stable")[:n]
+        return [(int(i % n_features), bool(i < n_features)) for i in order]
+
+    def most_informative_features(self, n=100):
+        'returns (feature name, value) pairs ordered by how strongly they separate the labels'
+        names = self.vocabulary.feature_names()
+        return [(names[column], value) for column, value in self._most_informative_columns(n)]
+
+    def show_most_informative_features(self, n=10):
+        names = self.vocabulary.feature_names()
+        print("Most Informative Features")
+        for column, value in self._most_informative_columns(n):
+            log_probs = self.log_present[:, column] if value else self.log_absent[:, column]
+            order = np.argsort(-log_probs, kind="stable")
+            first, second = order[0], order[-1]
+            ratio = np.exp2(log_probs[first] - log_probs[second])
+            print("%24s = %-14r %6s : %-6s = %8.1f : 1.0" % (
+                names[column], value, ("%s" % self._labels[first])[:6], ("%s" % self._labels[second])[:6], ratio))
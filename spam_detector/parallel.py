@@ -0,0 +1,49 @@
+## Multi-process preprocessing of the corpus
+
+import os
+from multiprocessing import Pool
+
+from spam_detector.preprocessing import Preprocessor, preprocessing_config
+from spam_detector.token_cache import NormalizationCache
+
+## - one preprocessor per worker process, created by `_init_worker`
+_worker_preprocessor = None
+
+
+def _init_worker(config):
+    'loads the stopwords, tokenizer and WordNet once per worker instead of once per task'
+    global _worker_preprocessor
+    _worker_preprocessor = Preprocessor(cache=NormalizationCache(), **config)
+    _worker_preprocessor.tokens("warming up the lazily loaded corpora")
+
+
+def _preprocess_chunk(messages):
+    return [_worker_preprocessor.tokens(message) for message in messages]
+
+
+def chunked(items, chunk_size):
+    return [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+
+
+def preprocess_parallel(messages, workers=None, chunk_size=None, stem=False, min_length=3, language="english",
+                        pos="v", tokenizer="word"):
+    '''preprocesses the messages in a pool of worker processes
+
+    Returns one token list per message, in the order of `messages`, identical
+    to `Preprocessor(stem, min_length, language, pos, tokenizer).tokens_many(messages)`.
+    `workers` defaults to the number of CPUs; with one worker no pool is
+    started. Messages are sent to the workers in chunks of `chunk_size`
+    (by default about four chunks per worker).
+    '''
+    messages = list(messages)
+    config = preprocessing_config(stem, min_length, language, pos, tokenizer)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(messages) < 2:
+        return Preprocessor(cache=NormalizationCache(), **config).tokens_many(messages)
+
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(messages) // (workers * 4)))
+    with Pool(workers, initializer=_init_worker, initargs=(config,)) as pool:
+        ## - imap returns the chunks in submission order, whichever worker finishes first
+        results = pool.imap(_preprocess_chunk, chunked(messages, chunk_size))
+        return [tokens for chunk in results for tokens in chunk]
@@ -0,0 +1,247 @@
+## Preprocessing pipeline shared by training and scoring
+
+import re
+from array import array
+from functools import partial
+from time import perf_counter
+
+from nltk.tokenize import NLTKWordTokenizer, sent_tokenize
+from nltk.corpus import stopwords
+from nltk.stem.porter import PorterStemmer
+from nltk.stem import WordNetLemmatizer
+
+from spam_detector import instrumentation
+from spam_detector.features import FeatureEncoder
+
+
+class WordTokenizer(object):
+    '''`nltk.word_tokenize` with the sentence splitter and the Treebank regexes bound once
+
+    Produces exactly the tokens of `word_tokenize(text, language)`: the text is
+    split into sentences with Punkt and every sentence is tokenized with the
+    same precompiled `NLTKWordTokenizer` patterns.
+    '''
+
+    def __init__(self, language="english"):
+        self.language = language
+        self._sentences = partial(sent_tokenize, language=language)
+        self._words = NLTKWordTokenizer().tokenize
+
+    def __call__(self, text):
+        words = self._words
+        return [token for sentence in self._sentences(text) for token in words(sentence)]
+
+
+## - alternatives are tried in order at every position, so the specific forms come before plain words
+SMS_TOKEN_PATTERN = r"""
+      (?:https?://|www\.)[^\s<>"]*[^\s<>".,!?;:)\]']         # urls
+    | [\w.+-]+@[\w-]+(?:\.[\w-]+)+                           # e-mail addresses
+    | [\w-]+(?:\.[\w-]+)*\.(?:com|net|org|biz|info|co\.uk)\b   # bare domains : t-mobile.co.uk
+      (?:/[^\s<>"]*[^\s<>".,!?;:)\]'])?
+    | [£$€]\d+(?:[.,]\d+)*                                   # currency amounts : £900, £1.50, $2,000
+    | \d+(?:\.\d+)?p\b                                       # prices in pence : 150p
+    | \+?\d{2,}(?:-\d{2,})+                                   # hyphenated phone numbers : 0800-542-0825
+    | \d+\.\d+                                               # decimals : 1.50
+    | (?<!\w)[:;=][-'o^]?[)(\]\[dpo/\\|*@$]+(?!\w)           # emoticons : :) ;-) :p =d
+    | <3+ | \^_*\^
+    | [\U0001F000-\U0001FAFF\u2600-\u27BF]                    # emoji
+    | \w+(?:['’](?!s\b)\w+)*                              # words, numbers and short codes : don't, 87121
+    | \.{2,} | [!?]{2,}                                     # ellipses and repeated !?
+"""
+
+
+class SMSTokenizer(object):
+    '''single-pass regex tokenizer for SMS text, a faster alternative to `WordTokenizer`
+
+    One precompiled pattern keeps currency amounts (`£900`), phone numbers and
+    short codes (`87121`, `0800-542-0825`), urls, e-mail addresses, emoticons
+    and emoji as single tokens. Contractions stay whole (`don't`) but a
+    trailing `'s` is split off as the token `s` (`john's` -> `john`, `s`),
+    which the Preprocessor length filter removes; other punctuation is skipped. There is no
+    sentence splitting, so its output differs from `word_tokenize` on
+    punctuation and contractions.
+    '''
+
+    def __init__(self, pattern=SMS_TOKEN_PATTERN):
+        self.pattern = re.compile(pattern, re.VERBOSE | re.IGNORECASE)
+        self._findall = self.pattern.findall
+
+    def __call__(self, text):
+        return self._findall(text)
+
+
+def preprocessing_config(stem=False, min_length=3, language="english", pos="v", tokenizer="word"):
+    'the JSON-ready settings of a Preprocessor, stored with cached corpora and saved models'
+    return {"stem": stem, "min_length": min_length, "language": language, "pos": pos, "tokenizer": tokenizer}
+
+
+def make_tokenizer(name, language="english"):
+    'returns the tokenizer called `name` : "word" (`word_tokenize`) or "sms" (`SMSTokenizer`)'
+    if name == "word":
+        return WordTokenizer(language)
+    if name == "sms":
+        return SMSTokenizer()
+    raise ValueError("unknown tokenizer %r, expected 'word' or 'sms'" % (name,))
+
+
+class Preprocessor(object):
+    '''changes a message to lower case, tokenizes it, removes stopwords and lemmatizes/stems the remainder
+
+    The stopword set, tokenizer, stemmer and lemmatizer are loaded once when the
+    object is created, so calling it on a message only does the per-token work.
+    The output equals the token list the training script used to build with
+    `[e.lower() for e in preprocess(message, stem).split() if len(e) >= 3]`.
+
+    Passing a `NormalizationCache` as `cache` memoizes the stemmer/lemmatizer
+    results; the cache then owns the stemmer and lemmatizer that are used.
+    `tokenizer` is a callable or the name of one for `make_tokenizer`
+    ("word", the default, or "sms").
+    '''
+
+    def __init__(self, stem=False, min_length=3, language="english", pos="v",
+                 tokenizer="word", stemmer=None, lemmatizer=None, cache=None):
+        self.stem = stem
+        self.min_length = min_length
+        self.language = language
+        self.pos = pos
+
+        ## - a frozenset gives constant time stopword checks instead of scanning a list
+        self.stopwords = frozenset(stopwords.words(language))
+        if tokenizer is None or isinstance(tokenizer, str):
+            ## - kept so `config` can name the tokenizer, a custom callable has no name
+            self.tokenizer_name = tokenizer or "word"
+            tokenizer = make_tokenizer(self.tokenizer_name, language)
+        else:
+            self.tokenizer_name = None
+        self.tokenizer = tokenizer
+        self.stemmer = stemmer if stemmer is not None else PorterStemmer()
+        self.lemmatizer = lemmatizer if lemmatizer is not None else WordNetLemmatizer()
+        self.cache = cache
+
+        if cache is not None:
+            instrumentation.watch_cache(cache)
+            self.normalize = cache.stem if stem else partial(cache.lemmatize, pos=pos)
+        elif stem:
+            self.normalize = self.stemmer.stem
+        else:
+            self.normalize = partial(self.lemmatizer.lemmatize, pos=pos)
+
+    def config(self):
+        'returns the settings to rebuild this preprocessor with `Preprocessor(**config)`'
+        if self.tokenizer_name is None:
+            raise ValueError("a Preprocessor with a custom tokenizer cannot be described by its settings")
+        return preprocessing_config(self.stem, self.min_length, self.language, self.pos, self.tokenizer_name)
+
+    def __call__(self, document):
+        return self.tokens(document)
+
+    def tokens(self, document):
+        'returns the list of normalized tokens of a single message'
+        if instrumentation.ENABLED:
+            return self._tokens_timed(document)
+        stop_words = self.stopwords
+        normalize = self.normalize
+        min_length = self.min_length
+
+        words = []
+        for word in self.tokenizer(document.lower()):
+            if word in stop_words:
+                continue
+            word = normalize(word)
+            if len(word) >= min_length:
+                words.append(word)
+        return words
+
+    def _tokens_timed(self, document):
+        'the stages of `tokens` one after another, each timed for the instrumentation report'
+        start = perf_counter()
+        tokens = self.tokenizer(document.lower())
+        tokenized = perf_counter()
+        stop_words = self.stopwords
+        kept = [word for word in tokens if word not in stop_words]
+        filtered = perf_counter()
+        min_length = self.min_length
+        words = [word for word in map(self.normalize, kept) if len(word) >= min_length]
+        normalized = perf_counter()
+
+        instrumentation.record("tokenize", tokenized - start)
+        instrumentation.record("stopwords", filtered - tokenized, len(tokens))
+        instrumentation.record("normalize", normalized - filtered, len(kept))
+        instrumentation.count("messages")
+        instrumentation.count("tokens", len(tokens))
+        instrumentation.count("stopwords_removed", len(tokens) - len(kept))
+        return words
+
+    def tokens_many(self, documents):
+        'returns a list of token lists, one for every message'
+        return [self.tokens(document) for document in documents]
+
+
+class Featurizer(object):
+    '''raw message -> sorted ids of the vocabulary words it contains
+
+    `featurize` is the single featurization path: the training split is built
+    with it and every inference path (the training script, `BatchClassifier`,
+    the streaming and HTTP scorers) calls it, so the model always sees features
+    produced by the same lower-casing, stopword removal, lemmatization/stemming
+    and length filter it was trained on. Tokenization, normalization and the
+    vocabulary lookup happen in one pass with no intermediate strings.
+
+    With `counts` every occurrence of a word gives one id, the term count
+    encoding the multinomial models are trained on.
+    '''
+
+    def __init__(self, vocabulary, preprocessor=None, counts=False):
+        self.vocabulary = vocabulary
+        self.preprocessor = preprocessor if preprocessor is not None else Preprocessor()
+        self.encoder = FeatureEncoder(vocabulary)
+        self.counts = counts
+        self._index = vocabulary.index
+
+    def tokens(self, raw_text):
+        return self.preprocessor.tokens(raw_text)
+
+    def featurize(self, raw_text):
+        'returns an array of the sorted, unique vocabulary ids of the message'
+        if instrumentation.ENABLED:
+            return self._featurize_timed(raw_text)
+        if self.counts:
+            return self.encoder.encode_terms(self.preprocessor.tokens(raw_text))
+        preprocessor = self.preprocessor
+        stop_words = preprocessor.stopwords
+        normalize = preprocessor.normalize
+        min_length = preprocessor.min_length
+        index = self._index
+
+        ids = set()
+        for word in preprocessor.tokenizer(raw_text.lower()):
+            if word in stop_words:
+                continue
+            word = normalize(word)
+            if len(word) >= min_length:
+                word_id = index.get(word)
+                if word_id is not None:
+                    ids.add(word_id)
+        return array('i', sorted(ids))
+
+    def _featurize_timed(self, raw_text):
+        tokens = self.preprocessor._tokens_timed(raw_text)
+        start = perf_counter()
+        ids = self.encode_tokens(tokens)
+        instrumentation.record("extract_features", perf_counter() - start, len(tokens))
+        return ids
+
+    def featurize_many(self, raw_texts):
+        return [self.featurize(raw_text) for raw_text in raw_texts]
+
+    def encode_tokens(self, tokens):
+        'returns the ids of an already preprocessed token list, equal to `featurize` of its message'
+        if self.counts:
+            return self.encoder.encode_terms(tokens)
+        return self.encoder.encode(tokens)
+
+    def featureset(self, raw_text):
+        'returns the nltk `contains(word)` dict of the message, for nltk classifiers'
+        return self.encoder.featureset(self.featurize(raw_text))
+
+    __call__ = featurize
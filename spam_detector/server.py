@@ -0,0 +1,298 @@
+## Long-running asyncio HTTP scoring service
+##
+## usage : python -m spam_detector.server MODEL [--host 127.0.0.1] [--port 8080]
+##
+## POST /classify        {"message": "..."}          -> {"label": "spam", "spam_probability": 0.99}
+## POST /classify_batch  {"messages": ["...", ...]}  -> {"results": [{"label": ..., "spam_probability": ...}]}
+## GET  /metrics         latency / throughput counters as JSON, with the per-stage report when started
+##                       with --instrument
+## GET  /health          {"status": "ok"}
+
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from spam_detector import instrumentation
+from spam_detector.batch import BatchClassifier
+from spam_detector.streaming import load_classifier
+
+MAX_BODY_SIZE = 10 * 1024 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error", 501: "Not Implemented"}
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class Metrics(object):
+    'request latencies and throughput counters of the service'
+
+    def __init__(self, window=10000):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.messages = 0
+        self.batches = 0
+        self.batched_messages = 0
+        self.latencies = deque(maxlen=window)
+
+    def record_request(self, latency, messages):
+        self.requests += 1
+        self.messages += messages
+        self.latencies.append(latency)
+
+    def record_batch(self, size):
+        self.batches += 1
+        self.batched_messages += size
+
+    def snapshot(self):
+        uptime = time.monotonic() - self.started
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return 1e3 * latencies[min(len(latencies) - 1, int(p / 100.0 * len(latencies)))]
+
+        return {
+            "uptime_seconds": uptime,
+            "requests": self.requests,
+            "errors": self.errors,
+            "messages": self.messages,
+            "messages_per_second": self.messages / uptime if uptime else 0.0,
+            "batches": self.batches,
+            "mean_batch_size": self.batched_messages / self.batches if self.batches else 0.0,
+            "latency_ms": {"p50": percentile(50), "p90": percentile(90), "p99": percentile(99),
+                           "max": 1e3 * latencies[-1] if latencies else 0.0},
+        }
+
+
+class MicroBatcher(object):
+    '''collects messages from concurrent requests and scores them together
+
+    A batch is flushed when it holds `max_batch_size` messages or when the
+    oldest message has waited `max_delay` seconds. Scoring runs in a single
+    worker thread, so the event loop keeps accepting requests meanwhile.
+    '''
+
+    def __init__(self, scorer, metrics, max_batch_size=256, max_delay=0.005):
+        self.scorer = scorer
+        self.metrics = metrics
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=True)
+
+    async def classify(self, messages):
+        'returns [(label, spam probability)] of the messages once their batch is scored'
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((messages, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + self.max_delay
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            messages = [message for (request_messages, future) in pending for message in request_messages]
+            try:
+                labels, probabilities = await loop.run_in_executor(self.executor, self.scorer.score_batch, messages)
+            except Exception as error:
+                for request_messages, future in pending:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.metrics.record_batch(len(messages))
+
+            results = list(zip(labels, probabilities.tolist()))
+            start = 0
+            for request_messages, future in pending:
+                if not future.done():
+                    future.set_result(results[start:start + len(request_messages)])
+                start += len(request_messages)
+
+
+class ScoringService(object):
+    'HTTP front end of a MicroBatcher'
+
+    def __init__(self, classifier, max_batch_size=256, max_delay=0.005):
+        self.metrics = Metrics()
+        self.batcher = MicroBatcher(BatchClassifier(classifier), self.metrics, max_batch_size, max_delay)
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=8080):
+        self.batcher.start()
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.batcher.stop()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                start = time.monotonic()
+                keep_alive = True
+                try:
+                    method, path, headers = parse_head(head)
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    if "transfer-encoding" in headers:
+                        ## - the body is left unread, so the connection cannot be reused
+                        keep_alive = False
+                        raise HTTPError(501, "Transfer-Encoding is not supported, send a Content-Length")
+                    try:
+                        length = int(headers.get("content-length", 0))
+                    except ValueError:
+                        keep_alive = False
+                        raise HTTPError(400, "invalid Content-Length")
+                    if length > MAX_BODY_SIZE:
+                        ## - the body is left unread, so the connection cannot be reused
+                        keep_alive = False
+                        raise HTTPError(413, "request body is larger than %d bytes" % MAX_BODY_SIZE)
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload, messages = await self.dispatch(method, path, body)
+                    self.metrics.record_request(time.monotonic() - start, messages)
+                except HTTPError as error:
+                    self.metrics.errors += 1
+                    status, payload = error.status, {"error": str(error)}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as error:
+                    ## - e.g. a scoring failure passed on by the MicroBatcher
+                    self.metrics.errors += 1
+                    status, payload = 500, {"error": "%s: %s" % (type(error).__name__, error)}
+                await write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, body):
+        'returns (status, JSON payload, number of classified messages)'
+        if path == "/health":
+            return 200, {"status": "ok"}, 0
+        if path == "/metrics":
+            payload = self.metrics.snapshot()
+            if instrumentation.ENABLED:
+                ## - taken in the scoring thread, the only one writing to the report
+                payload["instrumentation"] = await asyncio.get_running_loop().run_in_executor(
+                    self.batcher.executor, instrumentation.snapshot)
+            return 200, payload, 0
+        if path not in ("/classify", "/classify_batch"):
+            raise HTTPError(404, "unknown path %s" % path)
+        if method != "POST":
+            raise HTTPError(405, "%s only accepts POST" % path)
+
+        try:
+            request = json.loads(body.decode("utf-8"))
+        except ValueError:
+            raise HTTPError(400, "request body is not valid JSON")
+
+        if path == "/classify":
+            message = request.get("message") if isinstance(request, dict) else None
+            if not isinstance(message, str):
+                raise HTTPError(400, "expected {\"message\": \"...\"}")
+            [(label, probability)] = await self.batcher.classify([message])
+            return 200, {"label": label, "spam_probability": probability}, 1
+
+        messages = request.get("messages") if isinstance(request, dict) else None
+        if not isinstance(messages, list) or not all(isinstance(message, str) for message in messages):
+            raise HTTPError(400, "expected {\"messages\": [\"...\", ...]}")
+        results = await self.batcher.classify(messages) if messages else []
+        return 200, {"results": [{"label": label, "spam_probability": probability}
+                                 for (label, probability) in results]}, len(messages)
+
+
+def parse_head(head):
+    'returns (method, path, lower-cased headers) of the request line and headers'
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, path, version = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return method, path.split("?", 1)[0], headers
+
+
+async def write_response(writer, status, payload, keep_alive=True):
+    body = json.dumps(payload).encode("utf-8")
+    head = "HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: %s\r\n\r\n" % (
+        status, REASONS.get(status, ""), len(body), "keep-alive" if keep_alive else "close")
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+async def serve(classifier, host="127.0.0.1", port=8080, max_batch_size=256, max_delay=0.005):
+    service = ScoringService(classifier, max_batch_size, max_delay)
+    server = await service.start(host, port)
+    print("serving on %s" % ", ".join("%s:%d" % socket.getsockname()[:2] for socket in server.sockets))
+    try:
+        await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the spam classifier over HTTP")
+    parser.add_argument("model", help="model file or pickled classifier")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-size", type=int, default=256, help="messages scored together at most")
+    parser.add_argument("--max-delay-ms", type=float, default=5.0, help="longest wait to fill a batch")
+    parser.add_argument("--instrument", action="store_true", help="report per-stage timings under /metrics")
+    args = parser.parse_args(argv)
+
+    classifier = load_classifier(args.model)
+    if args.instrument:
+        instrumentation.enable()
+    try:
+        asyncio.run(serve(classifier, args.host, args.port, args.max_batch_size, args.max_delay_ms / 1e3))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
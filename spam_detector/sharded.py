@@ -0,0 +1,169 @@
+## Map-reduce training : per-shard count tables, merged into one classifier
+
+import os
+from functools import reduce
+from multiprocessing import Pool
+
+import numpy as np
+
+from spam_detector.features import FeatureMatrix, Vocabulary
+from spam_detector.naive_bayes import VectorizedNaiveBayes, count_matrix
+from spam_detector.preprocessing import Preprocessor, preprocessing_config
+from spam_detector.token_cache import NormalizationCache
+
+
+class CountTable(object):
+    '''the sufficient statistics of Naive Bayes training over one shard of the corpus
+
+    feature_counts[c, j] is the number of messages of label c containing
+    words[j], label_counts[c] the number of messages of label c. Words and
+    labels are kept in first-seen order, so merging the tables of consecutive
+    shards in corpus order reproduces the vocabulary single-process training
+    builds. Counts are integers, so merging is exact and associative.
+    '''
+
+    def __init__(self, labels, words, feature_counts, label_counts):
+        self.labels = list(labels)
+        self.words = list(words)
+        self.feature_counts = np.asarray(feature_counts, dtype=np.int64)
+        self.label_counts = np.asarray(label_counts, dtype=np.int64)
+        if self.feature_counts.shape != (len(self.labels), len(self.words)):
+            raise ValueError("feature_counts has shape %r, expected %r" % (self.feature_counts.shape,
+                                                                             (len(self.labels), len(self.words))))
+
+    @classmethod
+    def from_documents(cls, labeled_documents):
+        'counts (token list, label) pairs, e.g. `Preprocessor` output'
+        labeled_documents = list(labeled_documents)
+        vocabulary = Vocabulary.from_documents(tokens for (tokens, label) in labeled_documents)
+        index = vocabulary.index
+        matrix = FeatureMatrix.from_encoded([sorted(set(index[word] for word in tokens))
+                                             for (tokens, label) in labeled_documents],
+                                            [label for (tokens, label) in labeled_documents])
+        labels, feature_counts, label_counts = count_matrix(matrix, len(vocabulary))
+        return cls(labels, vocabulary.words, feature_counts, label_counts)
+
+    def __len__(self):
+        'number of counted messages'
+        return int(self.label_counts.sum())
+
+    def merge(self, other):
+        'returns a new table with the counts of both, words and labels of `other` not in this table appended'
+        vocabulary = Vocabulary(self.words)
+        columns = [vocabulary.add(word) for word in other.words]
+        label_index = Vocabulary(self.labels)
+        rows = [label_index.add(label) for label in other.labels]
+
+        feature_counts = np.zeros((len(label_index), len(vocabulary)), dtype=np.int64)
+        feature_counts[:len(self.labels), :len(self.words)] = self.feature_counts
+        feature_counts[np.ix_(rows, columns)] += other.feature_counts
+        label_counts = np.zeros(len(label_index), dtype=np.int64)
+        label_counts[:len(self.labels)] = self.label_counts
+        label_counts[rows] += other.label_counts
+        return CountTable(label_index.words, vocabulary.words, feature_counts, label_counts)
+
+    __add__ = merge
+
+    def to_classifier(self, **kwargs):
+        'builds the VectorizedNaiveBayes classifier of these counts'
+        return VectorizedNaiveBayes.from_counts(list(self.labels), Vocabulary(self.words),
+                                                self.feature_counts.astype(np.float64),
+                                                self.label_counts.astype(np.float64), **kwargs)
+
+    def save(self, path):
+        'writes the table as a compressed .npz file, readable without unpickling'
+        with open(path, "wb") as f:
+            np.savez_compressed(f, labels=np.array(self.labels, dtype=str), words=np.array(self.words, dtype=str),
+                                feature_counts=self.feature_counts, label_counts=self.label_counts)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["labels"].tolist(), data["words"].tolist(), data["feature_counts"],
+                       data["label_counts"])
+
+    def __eq__(self, other):
+        return (isinstance(other, CountTable) and self.labels == other.labels and self.words == other.words and
+                np.array_equal(self.feature_counts, other.feature_counts) and
+                np.array_equal(self.label_counts, other.label_counts))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '<CountTable %d messages, %d labels, %d words>' % (len(self), len(self.labels), len(self.words))
+
+
+def merge_count_tables(tables):
+    '''merges the tables of consecutive shards, given in corpus order
+
+    Tables are merged pairwise as a balanced tree; since merging is
+    associative the result is the same as merging them one after another.
+    '''
+    tables = list(tables)
+    if not tables:
+        raise ValueError("nothing to merge")
+    while len(tables) > 1:
+        tables = [reduce(CountTable.merge, tables[start:start + 2]) for start in range(0, len(tables), 2)]
+    return tables[0]
+
+
+def shard(items, n_shards):
+    'splits items into `n_shards` consecutive slices of nearly equal size'
+    items = list(items)
+    n_shards = max(1, min(n_shards, len(items)))
+    size, extra = divmod(len(items), n_shards)
+    bounds = [0]
+    for i in range(n_shards):
+        bounds.append(bounds[-1] + size + (i < extra))
+    return [items[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+## - one preprocessor per worker process when counting raw messages, created by `_init_worker`
+_worker_preprocessor = None
+
+
+def _init_worker(config):
+    global _worker_preprocessor
+    _worker_preprocessor = Preprocessor(cache=NormalizationCache(), **config) if config is not None else None
+
+
+def _count_shard(labeled_documents):
+    if _worker_preprocessor is not None:
+        labeled_documents = [(_worker_preprocessor.tokens(message), label) for (message, label) in labeled_documents]
+    return CountTable.from_documents(labeled_documents)
+
+
+def count_sharded(labeled_documents, n_shards=None, workers=None, preprocess=None):
+    '''the map step : returns one CountTable per shard, in corpus order
+
+    `labeled_documents` are (token list, label) pairs, or (raw message, label)
+    pairs when `preprocess` is a dict of `Preprocessor` options, in which case
+    the workers also tokenize. Shards are counted in a pool of `workers`
+    processes (default : the number of CPUs), each standing in for a node.
+    '''
+    workers = workers or os.cpu_count() or 1
+    shards = shard(labeled_documents, n_shards or workers)
+    if workers == 1:
+        _init_worker(preprocess)
+        try:
+            return [_count_shard(documents) for documents in shards]
+        finally:
+            _init_worker(None)
+    with Pool(workers, initializer=_init_worker, initargs=(preprocess,)) as pool:
+        return pool.map(_count_shard, shards, chunksize=1)
+
+
+def train_sharded(labeled_documents, n_shards=None, workers=None, preprocess=None, **kwargs):
+    '''counts the shards in parallel, merges the tables and builds the classifier
+
+    The result is bit-identical to `VectorizedNaiveBayes.train_matrix` over the
+    whole corpus with `Vocabulary.from_documents` of its token lists. When
+    the messages are preprocessed here, the settings are kept on the
+    classifier for `save_model`.
+    '''
+    classifier = merge_count_tables(count_sharded(labeled_documents, n_shards, workers,
+                                                  preprocess)).to_classifier(**kwargs)
+    if preprocess is not None:
+        classifier.preprocessing = preprocessing_config(**preprocess)
+    return classifier
@@ -0,0 +1,159 @@
+## Seeded, index-based train / test splits and k-fold cross-validation
+
+import os
+import time
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+from spam_detector.evaluation import accuracy
+from spam_detector.features import Vocabulary
+from spam_detector.naive_bayes import VectorizedNaiveBayes
+from spam_detector.token_store import TokenCorpus
+
+
+def _label_ids(labels):
+    'returns labels as an int array, numbering label names in first-seen order'
+    labels = np.asarray(labels)
+    if labels.dtype.kind in "iu":
+        return labels
+    index = {}
+    return np.fromiter((index.setdefault(label, len(index)) for label in labels.tolist()), dtype=np.intp,
+                       count=len(labels))
+
+
+def _groups(labels, stratify):
+    'returns one array of row numbers per label, or a single group of every row'
+    labels = _label_ids(labels)
+    if not stratify:
+        return [np.arange(len(labels))]
+    return [np.flatnonzero(labels == label) for label in np.unique(labels)]
+
+
+def train_test_split(labels, test_size=0.2, seed=0, stratify=True):
+    '''returns the sorted (train rows, test rows) index arrays of a seeded random split
+
+    `labels` holds the label of every message, e.g. `TokenCorpus.labels`.
+    With `stratify`, each label is split on its own so both sides keep the
+    spam / ham ratio of the corpus. The corpus is not touched; take or index
+    it with the returned rows.
+    '''
+    rng = np.random.default_rng(seed)
+    train, test = [], []
+    for rows in _groups(labels, stratify):
+        rows = rng.permutation(rows)
+        n_test = int(round(len(rows) * test_size))
+        test.append(rows[:n_test])
+        train.append(rows[n_test:])
+    return np.sort(np.concatenate(train)), np.sort(np.concatenate(test))
+
+
+def fold_ids(labels, k=5, seed=0, stratify=True):
+    '''returns the fold number, 0 to k - 1, of every message
+
+    Rows of each label are shuffled and dealt to the folds in turn, carrying
+    on from where the previous label stopped, so fold sizes differ by one
+    message at most and, with `stratify`, label ratios are the same in every fold.
+    '''
+    if k < 2:
+        raise ValueError("k-fold cross-validation needs k >= 2, got %r" % (k,))
+    rng = np.random.default_rng(seed)
+    folds = np.empty(len(labels), dtype=np.intp)
+    dealt = 0
+    for rows in _groups(labels, stratify):
+        folds[rng.permutation(rows)] = (dealt + np.arange(len(rows))) % k
+        dealt += len(rows)
+    return folds
+
+
+def kfold(labels, k=5, seed=0, stratify=True):
+    'yields the sorted (train rows, test rows) of every fold'
+    folds = fold_ids(labels, k, seed, stratify)
+    for fold in range(k):
+        yield np.flatnonzero(folds != fold), np.flatnonzero(folds == fold)
+
+
+def _evaluate_fold(corpus, classifier, train_rows, test_rows):
+    'trains on the train rows of the corpus, returns (accuracy on the test rows, seconds)'
+    start = time.perf_counter()
+    counts = getattr(classifier, "term_counts", False)
+    model = classifier.train_matrix(corpus.take(train_rows).feature_matrix(counts=counts), corpus.vocabulary)
+    score = accuracy(model, corpus.take(test_rows).feature_matrix(counts=counts))
+    return score, time.perf_counter() - start
+
+
+## - the corpus of a worker process, mapped onto the shared memory blocks by `_init_worker`
+_worker_corpus = None
+_worker_blocks = None
+
+
+def _share(arrays):
+    'copies the arrays into new shared memory blocks, returns (blocks, specs)'
+    blocks, specs = [], []
+    for array in arrays:
+        block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs.append((block.name, array.shape, array.dtype.str))
+    return blocks, specs
+
+
+def _init_worker(specs, words, label_names):
+    global _worker_corpus, _worker_blocks
+    _worker_blocks = [shared_memory.SharedMemory(name=name) for (name, shape, dtype) in specs]
+    indptr, token_ids, labels = [np.ndarray(shape, dtype=dtype, buffer=block.buf)
+                                 for block, (name, shape, dtype) in zip(_worker_blocks, specs)]
+    _worker_corpus = TokenCorpus(Vocabulary(words), indptr, token_ids, labels, label_names)
+
+
+def _run_fold(task):
+    fold, classifier, train_rows, test_rows = task
+    score, seconds = _evaluate_fold(_worker_corpus, classifier, train_rows, test_rows)
+    return fold, score, seconds
+
+
+def cross_validate(corpus, k=5, seed=0, stratify=True, workers=None, classifier=VectorizedNaiveBayes):
+    '''k-fold cross-validation of `classifier` on a TokenCorpus, returns a JSON-ready report
+
+    Every fold trains `classifier.train_matrix` on the other k - 1 folds and
+    measures its accuracy on the held out one, over the corpus vocabulary as
+    the training script does. With several `workers` (default the number of
+    CPUs, at most k) the folds run in worker processes that map the corpus
+    arrays from shared memory; only the fold row numbers are sent to them.
+    '''
+    if not isinstance(corpus, TokenCorpus):
+        corpus = TokenCorpus.from_labeled(corpus)
+    tasks = [(fold, classifier, train_rows, test_rows)
+             for fold, (train_rows, test_rows) in enumerate(kfold(corpus.labels, k, seed, stratify))]
+    workers = min(workers or os.cpu_count() or 1, k)
+
+    start = time.perf_counter()
+    if workers == 1:
+        results = [(fold,) + _evaluate_fold(corpus, classifier, train_rows, test_rows)
+                   for (fold, classifier, train_rows, test_rows) in tasks]
+    else:
+        ## - a slice shares the offsets of its parent, `take` makes them start at 0 again
+        compact = corpus.take(np.arange(len(corpus))) if corpus.indptr[0] else corpus
+        blocks, specs = _share([compact.indptr, compact.token_ids, compact.labels])
+        try:
+            with Pool(workers, initializer=_init_worker,
+                      initargs=(specs, corpus.vocabulary.words, corpus.label_names)) as pool:
+                results = pool.map(_run_fold, tasks)
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+    seconds = time.perf_counter() - start
+
+    scores = np.array([score for (fold, score, fold_seconds) in results])
+    return {
+        "k": k,
+        "seed": seed,
+        "stratify": stratify,
+        "workers": workers,
+        "folds": [{"fold": fold, "accuracy": score, "seconds": fold_seconds, "test": len(tasks[fold][3])}
+                  for (fold, score, fold_seconds) in results],
+        "mean_accuracy": float(scores.mean()),
+        "std_accuracy": float(scores.std()),
+        "seconds": seconds,
+    }
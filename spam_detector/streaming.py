@@ -0,0 +1,112 @@
+## Streaming classification of unbounded message logs
+##
+## usage : python -m spam_detector.streaming MODEL [INPUT] [--output OUTPUT] [--chunk-size N] [--profile PATH]
+##
+## INPUT holds `label<TAB>message` or bare message lines, `-` (the default) reads stdin.
+## Every output line is `predicted<TAB>spam probability<TAB>label<TAB>message`.
+## --profile writes a cProfile dump of the run to PATH and the per-stage report to stderr.
+
+import argparse
+import pickle
+import sys
+from contextlib import nullcontext
+
+from spam_detector import instrumentation
+from spam_detector.batch import BatchClassifier
+from spam_detector.model_io import from_pickled, is_model_file, load_model
+
+KNOWN_LABELS = ("ham", "spam")
+
+
+def parse_line(line, known_labels=KNOWN_LABELS):
+    'returns (label, message) of a `label<TAB>message` line, or (None, line) of a bare message'
+    line = line.rstrip("\r\n")
+    label, tab, message = line.partition("\t")
+    if tab and label in known_labels:
+        return label, message
+    return None, line
+
+
+def iter_messages(lines, known_labels=KNOWN_LABELS):
+    'yields (label, message) for every non-empty line'
+    for line in lines:
+        label, message = parse_line(line, known_labels)
+        if message:
+            yield label, message
+
+
+def iter_chunks(records, chunk_size):
+    'yields lists of at most chunk_size records'
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def classify_stream(lines, scorer, output, chunk_size=None):
+    '''classifies the lines chunk by chunk and writes the results as soon as each chunk is scored
+
+    Only one chunk is held in memory at a time. Returns a dict of counters; when
+    the input carries labels it also counts how many predictions were correct.
+    '''
+    chunk_size = chunk_size or scorer.batch_size
+    stats = {"messages": 0, "labeled": 0, "correct": 0}
+    for chunk in iter_chunks(iter_messages(lines), chunk_size):
+        predicted, probabilities = scorer.score_batch([message for (label, message) in chunk])
+        for (label, message), prediction, probability in zip(chunk, predicted, probabilities.tolist()):
+            output.write("%s\t%.6f\t%s\t%s\n" % (prediction, probability, label or "", message))
+            if label is not None:
+                stats["labeled"] += 1
+                stats["correct"] += label == prediction
+        stats["messages"] += len(chunk)
+        output.flush()
+    return stats
+
+
+def load_classifier(path):
+    'loads a saved model file, or a pickled model / nltk.NaiveBayesClassifier (only trusted pickles)'
+    if is_model_file(path):
+        return load_model(path)
+    with open(path, "rb") as f:
+        return from_pickled(pickle.load(f))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify an SMS log line by line")
+    parser.add_argument("model", help="model file or pickled classifier")
+    parser.add_argument("input", nargs="?", default="-", help="message file, - for stdin")
+    parser.add_argument("--output", default="-", help="result file, - for stdout")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="messages scored per chunk")
+    parser.add_argument("--profile", metavar="PATH", help="write a cProfile dump of the run to PATH")
+    args = parser.parse_args(argv)
+
+    scorer = BatchClassifier(load_classifier(args.model), batch_size=args.chunk_size)
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", errors="replace")
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    report = None
+    try:
+        with instrumentation.profile(args.profile) if args.profile else nullcontext():
+            stats = classify_stream(source, scorer, output)
+            ## - taken before leaving the profile block switches instrumentation off again
+            if args.profile:
+                report = instrumentation.to_json()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    print("classified %d messages" % stats["messages"], file=sys.stderr)
+    if stats["labeled"]:
+        print("accuracy on %d labeled messages : %.4f" % (stats["labeled"], stats["correct"] / stats["labeled"]),
+              file=sys.stderr)
+    if report is not None:
+        print(report, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+## Memoizing cache in front of the Porter stemmer and the WordNet lemmatizer
+
+import json
+import os
+from collections import OrderedDict
+
+from nltk.stem.porter import PorterStemmer
+from nltk.stem import WordNetLemmatizer
+
+STEM = "stem"
+LEMMA = "lemma"
+
+
+class NormalizationCache(object):
+    '''maps (token, mode, pos) to the stemmed or lemmatized form of the token
+
+    The SMS vocabulary is small and repetitive, so after a short warm up almost
+    every lookup is a hit and the stemmer/WordNet is only consulted once per
+    distinct word. Entries are evicted least-recently-used first once `maxsize`
+    is reached (`maxsize=None` keeps everything).
+    '''
+
+    def __init__(self, maxsize=100000, stemmer=None, lemmatizer=None):
+        if maxsize is not None and maxsize <= 0:
+            raise ValueError("maxsize must be positive or None, got %r" % (maxsize,))
+        self.maxsize = maxsize
+        self.stemmer = stemmer if stemmer is not None else PorterStemmer()
+        self.lemmatizer = lemmatizer if lemmatizer is not None else WordNetLemmatizer()
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def normalize(self, token, mode=LEMMA, pos="v"):
+        'returns the cached normalized form of the token, computing it on a miss'
+        key = (token, mode, pos)
+        entries = self._entries
+        try:
+            value = entries[key]
+        except KeyError:
+            self.misses += 1
+            value = self._compute(token, mode, pos)
+            entries[key] = value
+            if self.maxsize is not None and len(entries) > self.maxsize:
+                entries.popitem(last=False)
+            return value
+        entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def stem(self, token):
+        return self.normalize(token, STEM, None)
+
+    def lemmatize(self, token, pos="v"):
+        return self.normalize(token, LEMMA, pos)
+
+    def _compute(self, token, mode, pos):
+        if mode == STEM:
+            return self.stemmer.stem(token)
+        if mode == LEMMA:
+            return self.lemmatizer.lemmatize(token, pos=pos)
+        raise ValueError("unknown normalization mode %r" % (mode,))
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        'returns the counters as a plain dict'
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio(),
+        }
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def save(self, path):
+        'writes the entries to a JSON file, least recently used first'
+        entries = [[token, mode, pos, value] for (token, mode, pos), value in self._entries.items()]
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def warm(self, path):
+        'loads entries saved by `save`, returns the number of entries read'
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != 1:
+            raise ValueError("unsupported normalization cache version %r" % (data.get("version"),))
+        entries = self._entries
+        for token, mode, pos, value in data["entries"]:
+            entries[(token, mode, pos)] = value
+            entries.move_to_end((token, mode, pos))
+        while self.maxsize is not None and len(entries) > self.maxsize:
+            entries.popitem(last=False)
+        return len(data["entries"])
+
+    @classmethod
+    def load(cls, path, maxsize=100000, stemmer=None, lemmatizer=None):
+        'creates a cache warm-started from `path`, or an empty one if the file does not exist'
+        cache = cls(maxsize=maxsize, stemmer=stemmer, lemmatizer=lemmatizer)
+        if os.path.exists(path):
+            cache.warm(path)
+        return cache
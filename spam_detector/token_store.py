@@ -0,0 +1,220 @@
+## Interned, CSR-style store of the preprocessed corpus
+
+from array import array
+
+import numpy as np
+from nltk import FreqDist
+
+from spam_detector.features import FeatureMatrix, Vocabulary
+
+
+class TokenCorpus(object):
+    '''the token lists of a preprocessed corpus as integer ids in two flat arrays
+
+    Every distinct word is stored once, in `vocabulary`, which hands out ids
+    in first-seen order like `Vocabulary.from_documents`. The tokens of
+    message i, repeats and order included, are
+    `token_ids[indptr[i]:indptr[i + 1]]`. Labels are small ints indexing
+    `label_names`, as in SMSCorpus.
+
+    Indexing and iteration give (token list, label) tuples, so the store can
+    stand in for `messages_set`. Slices are views sharing the arrays of the
+    whole corpus; `take` copies the rows of a shuffled split once. Word and
+    document frequencies are computed on the id arrays, without flattening
+    the corpus into one word list.
+    '''
+
+    def __init__(self, vocabulary, indptr, token_ids, labels, label_names):
+        self.vocabulary = vocabulary
+        ## - offsets into `token_ids`, which a slice shares with the corpus it was cut from
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.token_ids = np.asarray(token_ids, dtype=np.int32)
+        self.labels = np.asarray(labels)
+        self.label_names = list(label_names)
+        if len(self.indptr) != len(self.labels) + 1:
+            raise ValueError("indptr must hold one offset more than there are labels")
+
+    @classmethod
+    def from_labeled(cls, labeled_documents, vocabulary=None):
+        '''interns (token list, label) pairs, e.g. `messages_set`, in one pass
+
+        New words are added to `vocabulary` when one is given.
+        '''
+        vocabulary = Vocabulary() if vocabulary is None else vocabulary
+        index, words = vocabulary.index, vocabulary.words
+        token_ids = array('i')
+        lengths = array('q')
+        label_ids = array('i')
+        label_index = {}
+        label_names = []
+        for tokens, label in labeled_documents:
+            ids = []
+            for word in tokens:
+                word_id = index.get(word)
+                if word_id is None:
+                    word_id = index[word] = len(words)
+                    words.append(word)
+                ids.append(word_id)
+            token_ids.extend(ids)
+            lengths.append(len(ids))
+            label_id = label_index.get(label)
+            if label_id is None:
+                label_id = label_index[label] = len(label_names)
+                label_names.append(label)
+            label_ids.append(label_id)
+        indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(np.frombuffer(lengths, dtype=np.int64), out=indptr[1:])
+        dtype = np.uint8 if len(label_names) <= 256 else np.int32
+        return cls(vocabulary, indptr, np.frombuffer(token_ids, dtype=np.int32),
+                   np.frombuffer(label_ids, dtype=np.int32).astype(dtype), label_names)
+
+    @classmethod
+    def from_documents(cls, documents, labels, vocabulary=None):
+        'interns token lists with their labels'
+        return cls.from_labeled(zip(documents, labels), vocabulary)
+
+    @property
+    def nbytes(self):
+        'bytes used by the id, offset and label arrays of this view'
+        start, stop = int(self.indptr[0]), int(self.indptr[-1])
+        return self.indptr.nbytes + 4 * (stop - start) + self.labels.nbytes
+
+    def __len__(self):
+        return len(self.labels)
+
+    def ids(self, i):
+        'returns the token ids of message i, a view into `token_ids`'
+        return self.token_ids[self.indptr[i]:self.indptr[i + 1]]
+
+    def tokens(self, i):
+        words = self.vocabulary.words
+        return [words[word_id] for word_id in self.ids(i).tolist()]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self.labels))
+            if step != 1:
+                return self.take(np.arange(start, stop, step))
+            stop = max(start, stop)
+            return TokenCorpus(self.vocabulary, self.indptr[start:stop + 1], self.token_ids, self.labels[start:stop],
+                               self.label_names)
+        if key < 0:
+            key += len(self.labels)
+        return self.tokens(key), self.label_names[self.labels[key]]
+
+    def __iter__(self):
+        words, names = self.vocabulary.words, self.label_names
+        token_ids = self.token_ids
+        bounds = self.indptr.tolist()
+        for row, label in enumerate(self.labels.tolist()):
+            yield [words[word_id] for word_id in token_ids[bounds[row]:bounds[row + 1]].tolist()], names[label]
+
+    def take(self, rows):
+        'returns a compact copy holding the messages at `rows`, in that order, e.g. a shuffled split'
+        rows = np.asarray(rows, dtype=np.intp)
+        lengths = self.indptr[rows + 1] - self.indptr[rows]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        ## - the position of every kept token in `token_ids`
+        positions = np.repeat(self.indptr[rows] - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return TokenCorpus(self.vocabulary, indptr, self.token_ids[positions], self.labels[rows], self.label_names)
+
+    def _entries(self):
+        'returns (row of every token, token ids) of this view'
+        start, stop = int(self.indptr[0]), int(self.indptr[-1])
+        rows = np.repeat(np.arange(len(self.labels)), np.diff(self.indptr))
+        return rows, self.token_ids[start:stop]
+
+    def word_frequency(self):
+        'returns the number of occurrences of every vocabulary id in this view'
+        return np.bincount(self._entries()[1], minlength=len(self.vocabulary))
+
+    def document_frequency(self):
+        'returns the number of messages of this view containing every vocabulary id'
+        rows, ids = self._entries()
+        keys = _unique(rows * len(self.vocabulary) + ids)
+        return np.bincount(keys % len(self.vocabulary), minlength=len(self.vocabulary))
+
+    def freq_dist(self):
+        'the `nltk.FreqDist` of every word of this view, in first-seen order like `FreqDist(all_words)`'
+        counts = self.word_frequency()
+        return FreqDist(dict((self.vocabulary.words[word_id], int(counts[word_id]))
+                             for word_id in self._first_seen()))
+
+    def _first_seen(self):
+        'returns the ids used by this view, in the order they first appear'
+        ids = self._entries()[1]
+        first = np.full(len(self.vocabulary), len(ids), dtype=np.int64)
+        np.minimum.at(first, ids, np.arange(len(ids)))
+        return ids[np.sort(first[first < len(ids)])].tolist()
+
+    def build_vocabulary(self):
+        '''returns the Vocabulary of the words used by this view, in first-seen order
+
+        Equal to `Vocabulary.from_documents` over the same token lists, e.g. for
+        the vocabulary of a training split.
+        '''
+        words = self.vocabulary.words
+        return Vocabulary(words[word_id] for word_id in self._first_seen())
+
+    def feature_matrix(self, vocabulary=None, counts=False):
+        '''encodes the view into a FeatureMatrix over `vocabulary` (default the corpus vocabulary)
+
+        Rows hold the sorted unique ids of the known words of each message, or
+        with `counts` one id per occurrence, like `FeatureEncoder.encode` and
+        `encode_terms`. Words missing from `vocabulary` are dropped.
+        '''
+        rows, ids = self._entries()
+        if vocabulary is not None and vocabulary is not self.vocabulary:
+            mapping = np.array([vocabulary.get(word, -1) for word in self.vocabulary.words], dtype=np.int64)
+            ids = mapping[ids]
+            known = ids >= 0
+            rows, ids = rows[known], ids[known]
+        n_features = len(self.vocabulary if vocabulary is None else vocabulary)
+        keys = rows * n_features + ids
+        keys = np.sort(keys) if counts else _unique(keys)
+        indptr = np.zeros(len(self.labels) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // n_features, minlength=len(self.labels)), out=indptr[1:])
+        return FeatureMatrix(indptr, keys % n_features, self.label_list())
+
+    def label_list(self):
+        'returns the label of every message'
+        names = self.label_names
+        return [names[label] for label in self.labels.tolist()]
+
+    def label_counts(self):
+        'returns {label: number of messages}'
+        counts = np.bincount(self.labels, minlength=len(self.label_names)).tolist()
+        return dict(zip(self.label_names, counts))
+
+    def save(self, path):
+        'writes the store as an .npz file, readable without unpickling'
+        start, stop = int(self.indptr[0]), int(self.indptr[-1])
+        with open(path, "wb") as f:
+            np.savez(f, words=np.array(self.vocabulary.words, dtype=str), indptr=self.indptr - start,
+                     token_ids=self.token_ids[start:stop], labels=self.labels,
+                     label_names=np.array(self.label_names, dtype=str))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(Vocabulary(data["words"].tolist()), data["indptr"], data["token_ids"], data["labels"],
+                       data["label_names"].tolist())
+
+    def __repr__(self):
+        return '<TokenCorpus %d messages, %d tokens, %d words, %d bytes>' % (
+            len(self), int(self.indptr[-1] - self.indptr[0]), len(self.vocabulary), self.nbytes)
+
+
+
+def _starts(sorted_values):
+    'returns the mask of the first entry of every run of equal values'
+    starts = np.ones(len(sorted_values), dtype=bool)
+    np.not_equal(sorted_values[1:], sorted_values[:-1], out=starts[1:])
+    return starts
+
+
+def _unique(values):
+    ## - sort and mask, np.unique is several times slower on millions of int64 keys
+    values = np.sort(values)
+    return values[_starts(values)]
@@ -0,0 +1,79 @@
+import pytest
+from nltk.stem.porter import PorterStemmer
+
+from spam_detector import Featurizer, NormalizationCache, Preprocessor, SMSTokenizer, Vocabulary, instrumentation
+from spam_detector import preprocessing
+
+MESSAGES = [
+    "CONGRATULATIONS!! As a valued account holder you have been selected to receive a £900 prize reward!",
+    "Free entry in 2 a wkly comp to win FA Cup final tkts 21st May 2005. Text FA to 87121 now",
+    "Sorry, I'll call later. Are you going to the meeting tomorrow?",
+    "WINNER!! Call 0800-542-0825 or visit www.prizes.co.uk to claim your reward :)",
+    "Ok lar... Joking wif u oni... I'm watching the games they're playing",
+    "",
+    "the and of to",
+]
+
+## - messages with words the vocabulary, built from MESSAGES, has never seen
+UNSEEN = [
+    "Claim your brand new phone, call now",
+    "Meeting moved, playing games tonight instead",
+]
+
+
+class StubStopwords(object):
+    'stands in for the nltk stopwords corpus, which needs downloaded data'
+
+    def words(self, language):
+        return ["the", "and", "of", "to", "a", "you", "are", "in", "or", "your", "i", "as", "have", "been", "now"]
+
+
+class StubLemmatizer(object):
+    'strips a few verb endings, enough to exercise the lemmatizer path without WordNet data'
+
+    def lemmatize(self, word, pos="n"):
+        for suffix in ("ing", "ed", "s"):
+            if word.endswith(suffix) and len(word) > len(suffix) + 2:
+                return word[:-len(suffix)]
+        return word
+
+
+@pytest.fixture(autouse=True)
+def stub_stopwords(monkeypatch):
+    monkeypatch.setattr(preprocessing, "stopwords", StubStopwords())
+
+
+def preprocessors():
+    return [
+        Preprocessor(stem=True, tokenizer=SMSTokenizer(), stemmer=PorterStemmer()),
+        Preprocessor(stem=False, tokenizer=SMSTokenizer(), lemmatizer=StubLemmatizer()),
+        Preprocessor(stem=False, min_length=2, tokenizer=SMSTokenizer(), lemmatizer=StubLemmatizer(),
+                     cache=NormalizationCache(lemmatizer=StubLemmatizer())),
+    ]
+
+
+@pytest.mark.parametrize("counts", [False, True])
+@pytest.mark.parametrize("profile", [False, True])
+def test_featurize_equals_encoded_preprocessor_tokens(counts, profile):
+    for preprocessor in preprocessors():
+        vocabulary = Vocabulary.from_documents(preprocessor.tokens_many(MESSAGES))
+        featurizer = Featurizer(vocabulary, preprocessor, counts=counts)
+        if profile:
+            instrumentation.enable()
+        try:
+            for message in MESSAGES + UNSEEN:
+                expected = featurizer.encode_tokens(preprocessor.tokens(message))
+                assert list(featurizer.featurize(message)) == list(expected), message
+                assert featurizer.featureset(message) == featurizer.encoder.featureset(expected)
+        finally:
+            instrumentation.disable()
+
+
+def test_training_and_inference_features_agree():
+    preprocessor = preprocessors()[1]
+    training_tokens = preprocessor.tokens_many(MESSAGES)
+    featurizer = Featurizer(Vocabulary.from_documents(training_tokens), preprocessor)
+    training = [list(featurizer.encode_tokens(tokens)) for tokens in training_tokens]
+    assert [list(ids) for ids in featurizer.featurize_many(MESSAGES)] == training
+    ## - every word of a training message is in the vocabulary, so none is dropped
+    assert [len(ids) for ids in training] == [len(set(tokens)) for tokens in training_tokens]
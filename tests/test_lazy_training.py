@@ -0,0 +1,75 @@
+import numpy as np
+
+from spam_detector import (ComplementNaiveBayes, FeatureEncoder, FeatureMatrix, LazyFeatureMatrix,
+                           MultinomialNaiveBayes, VectorizedNaiveBayes, Vocabulary, build_feature_store)
+from spam_detector.feature_selection import remap_matrix, select_features
+
+MESSAGES = [
+    (["free", "prize", "call", "now"], "spam"),
+    (["see", "you", "at", "lunch"], "ham"),
+    (["win", "free", "cash", "free"], "spam"),
+    (["call", "me", "later"], "ham"),
+    (["lunch", "later", "ok"], "ham"),
+    (["urgent", "prize", "claim", "call"], "spam"),
+    (["ok", "see", "you", "soon"], "ham"),
+    (["cash", "prize", "win", "now"], "spam"),
+    (["where", "are", "you"], "ham"),
+    (["free", "entry", "win"], "spam"),
+]
+
+
+def feature_stores(encode, memory_budget=1, chunk_size=3):
+    'returns the (materialized, lazy) stores of MESSAGES'
+    documents = [tokens for (tokens, label) in MESSAGES]
+    labels = [label for (tokens, label) in MESSAGES]
+    matrix = build_feature_store(documents, labels, encode)
+    lazy = build_feature_store(documents, labels, encode, memory_budget=memory_budget, chunk_size=chunk_size)
+    return matrix, lazy
+
+
+def test_small_budget_gives_a_lazy_matrix():
+    vocabulary = Vocabulary.from_documents(tokens for (tokens, label) in MESSAGES)
+    matrix, lazy = feature_stores(FeatureEncoder(vocabulary).encode)
+    assert isinstance(matrix, FeatureMatrix)
+    assert isinstance(lazy, LazyFeatureMatrix)
+
+
+def test_bernoulli_trained_from_lazy_matrix_equals_materialized():
+    vocabulary = Vocabulary.from_documents(tokens for (tokens, label) in MESSAGES)
+    matrix, lazy = feature_stores(FeatureEncoder(vocabulary).encode)
+    expected = VectorizedNaiveBayes.train_encoded(matrix, vocabulary)
+    model = VectorizedNaiveBayes.train_encoded(lazy, vocabulary)
+    assert model.labels() == expected.labels()
+    np.testing.assert_array_equal(model.feature_counts, expected.feature_counts)
+    np.testing.assert_array_equal(model.label_counts, expected.label_counts)
+    np.testing.assert_array_equal(model.delta, expected.delta)
+    np.testing.assert_array_equal(model.bias, expected.bias)
+    assert model.classify_many(lazy) == expected.classify_many(matrix)
+
+
+def test_multinomial_trained_from_lazy_matrix_equals_materialized():
+    vocabulary = Vocabulary.from_documents(tokens for (tokens, label) in MESSAGES)
+    matrix, lazy = feature_stores(FeatureEncoder(vocabulary).encode_terms)
+    for classifier in (MultinomialNaiveBayes, ComplementNaiveBayes):
+        expected = classifier.train_encoded(matrix, vocabulary)
+        model = classifier.train_encoded(lazy, vocabulary)
+        np.testing.assert_array_equal(model.feature_counts, expected.feature_counts)
+        np.testing.assert_array_equal(model.delta, expected.delta)
+        np.testing.assert_array_equal(model.bias, expected.bias)
+
+
+def test_feature_selection_accepts_lazy_matrix():
+    vocabulary = Vocabulary.from_documents(tokens for (tokens, label) in MESSAGES)
+    matrix, lazy = feature_stores(FeatureEncoder(vocabulary).encode)
+    for score in (None, "chi2", "mutual_info"):
+        expected_vocabulary, expected_map = select_features(matrix, vocabulary, max_features=6, score=score)
+        pruned_vocabulary, id_map = select_features(lazy, vocabulary, max_features=6, score=score)
+        assert pruned_vocabulary.words == expected_vocabulary.words
+        np.testing.assert_array_equal(id_map, expected_map)
+
+        remapped = remap_matrix(lazy, id_map)
+        assert isinstance(remapped, LazyFeatureMatrix)
+        expected = remap_matrix(matrix, id_map)
+        assert [(list(ids), label) for (ids, label) in remapped] == [(list(ids), label) for (ids, label) in expected]
+        model = VectorizedNaiveBayes.train_matrix(remapped, pruned_vocabulary)
+        np.testing.assert_array_equal(model.delta, VectorizedNaiveBayes.train_matrix(expected, pruned_vocabulary).delta)
@@ -0,0 +1,48 @@
+import pickle
+
+import numpy as np
+
+from spam_detector import FeatureEncoder, FeatureMatrix, VectorizedNaiveBayes, Vocabulary
+
+MESSAGES = [
+    (["free", "prize", "call", "now"], "spam"),
+    (["see", "you", "at", "lunch"], "ham"),
+    (["win", "free", "cash", "free"], "spam"),
+    (["call", "me", "later"], "ham"),
+    (["lunch", "later", "ok"], "ham"),
+    (["urgent", "prize", "claim", "call"], "spam"),
+    (["ok", "see", "you", "soon"], "ham"),
+    (["cash", "prize", "win", "now"], "spam"),
+]
+
+
+def train(messages):
+    vocabulary = Vocabulary.from_documents(tokens for (tokens, label) in messages)
+    encoder = FeatureEncoder(vocabulary)
+    matrix = FeatureMatrix.from_encoded([encoder.encode(tokens) for (tokens, label) in messages],
+                                        [label for (tokens, label) in messages])
+    return VectorizedNaiveBayes.train_matrix(matrix, vocabulary)
+
+
+def test_partial_fit_equals_training_at_once():
+    classifier = train(MESSAGES[:3])
+    for start in range(3, len(MESSAGES), 2):
+        classifier.partial_fit(MESSAGES[start:start + 2])
+    full = train(MESSAGES)
+    assert classifier.vocabulary.words == full.vocabulary.words
+    assert classifier.labels() == full.labels()
+    np.testing.assert_allclose(classifier.delta, full.delta, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(classifier.bias, full.bias, rtol=0, atol=1e-12)
+
+
+def test_partial_fit_defers_the_refresh_until_the_model_is_read():
+    classifier = train(MESSAGES[:4])
+    classifier.partial_fit(MESSAGES[4:6])
+    classifier.partial_fit([(["brand", "new", "prize"], "spam")])
+    assert "delta" not in vars(classifier)
+    restored = pickle.loads(pickle.dumps(classifier))
+    encoder = FeatureEncoder(classifier.vocabulary)
+    assert classifier.classify(encoder.encode(["brand", "prize"])) == "spam"
+    assert "delta" in vars(classifier)
+    np.testing.assert_array_equal(restored.delta, classifier.delta)
+    assert encoder.featureset(encoder.encode(["brand"]))["contains(brand)"] is True